@@ -0,0 +1,263 @@
+import datetime
+import json
+import signal
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from zoneinfo import ZoneInfo
+
+import psycopg2
+from playwright.sync_api import sync_playwright
+
+from app.scrapers.club_scraper import ClubScraper
+from app.scrapers.runner_scraper import RunnerScraper
+from app.utils.date_utils import is_parkrun_day
+from app.utils.db_utils import DBClient
+from app.utils.identity_utils import create_identity_pool
+from app.utils.job_queue import Job, JobQueue
+from app.utils.profiling_utils import maybe_profile, profiling_enabled
+
+LONDON = ZoneInfo("Europe/London")
+# Results come in through Saturday afternoon and evening, so scrape a few times on event days
+EVENT_DAY_SCRAPE_HOURS = [11, 14, 18, 22]
+# Other days get a single catch-up scrape, like the daily Lambda schedule
+OTHER_DAY_SCRAPE_HOURS = [1]
+CLUB_SCRAPE_RETRY_SECONDS = 30 * 60
+CLUB_SCRAPE_PRIORITY = 0
+METADATA_PRIORITY = 10
+METADATA_BACKLOG_DELAY_SECONDS = 60
+METADATA_IDLE_DELAY_SECONDS = 60 * 60
+JOB_JITTER_SECONDS = 5 * 60
+DB_RETRY_SECONDS = 5
+MAX_DB_RETRY_SECONDS = 5 * 60
+
+
+def next_club_scrape_time(now):
+    local_now = datetime.datetime.fromtimestamp(now, LONDON)
+    for day_offset in range(8):
+        date = local_now.date() + datetime.timedelta(days=day_offset)
+        hours = EVENT_DAY_SCRAPE_HOURS if is_parkrun_day(date) else OTHER_DAY_SCRAPE_HOURS
+        for hour in hours:
+            scrape_time = datetime.datetime.combine(date, datetime.time(hour), tzinfo=LONDON)
+            if scrape_time > local_now:
+                return scrape_time.timestamp()
+
+
+def club_scrape_job(club_id, club_name, jitter=JOB_JITTER_SECONDS):
+    scraper = ClubScraper(club_id=club_id, club_name=club_name)
+
+    def next_run(success, now):
+        scheduled = next_club_scrape_time(now)
+        return scheduled if success else min(scheduled, now + CLUB_SCRAPE_RETRY_SECONDS)
+
+    return Job(
+        f"club-{club_id}",
+        lambda db_client, identity_pool: scraper.scrape_recent_results(db_client, identity_pool),
+        next_run,
+        priority=CLUB_SCRAPE_PRIORITY,
+        jitter=jitter,
+    )
+
+
+def metadata_job(limit=50, jitter=60):
+    scraper = RunnerScraper()
+
+    def next_run(success, now):
+        # Keep working through a backlog in the gaps between club scrapes, otherwise check back later
+        if success and scraper.runner_count >= limit:
+            return now + METADATA_BACKLOG_DELAY_SECONDS
+        return now + METADATA_IDLE_DELAY_SECONDS
+
+    return Job(
+        "metadata",
+        lambda db_client, identity_pool: scraper.scrape_missing_metadata(
+            limit=limit, db_client=db_client, identity_pool=identity_pool
+        ),
+        next_run,
+        priority=METADATA_PRIORITY,
+        jitter=jitter,
+    )
+
+
+class DaemonMetrics:
+    def __init__(self):
+        self.started_at = time.time()
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def record(self, job_name, success, duration, finished_at):
+        with self.lock:
+            job = self.jobs.setdefault(job_name, {"runs": 0, "failures": 0})
+            job["runs"] += 1
+            if not success:
+                job["failures"] += 1
+            job["last_success"] = success
+            job["last_duration_seconds"] = round(duration, 3)
+            job["last_finished_at"] = datetime.datetime.fromtimestamp(finished_at, datetime.timezone.utc).isoformat()
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "uptime_seconds": round(time.time() - self.started_at, 3),
+                "jobs": {name: dict(job) for name, job in self.jobs.items()},
+            }
+
+
+class Worker(threading.Thread):
+    def __init__(self, name, job_queue, metrics, identity_pool, profile=False):
+        super().__init__(name=name, daemon=True)
+        self.job_queue = job_queue
+        self.metrics = metrics
+        self.identity_pool = identity_pool
+        self.profile = profile
+
+    def run(self):
+        # Each worker keeps its own DB connection and browser for the life of the process, because the Playwright
+        # sync API is bound to the thread that created it. The client identities are shared by all workers.
+        with sync_playwright() as playwright_context_manager:
+            self.identity_pool.use_playwright(playwright_context_manager)
+            db_client = self.connect()
+            try:
+                while db_client:
+                    job = self.job_queue.get()
+                    if job is None:
+                        break
+                    if not self.run_job(job, db_client, self.identity_pool):
+                        db_client.close()
+                        db_client = self.connect()
+            finally:
+                if db_client:
+                    db_client.close()
+                self.identity_pool.close()
+        print(f"{self.name} stopped")
+
+    def connect(self):
+        # A DB outage shouldn't kill the worker, so keep trying with backoff until the DB is back or the daemon stops
+        delay = DB_RETRY_SECONDS
+        while not self.job_queue.closed:
+            try:
+                return DBClient()
+            except psycopg2.Error as e:
+                print(f"{self.name} could not connect to the database, retrying in {delay}s: {e}")
+                if self.job_queue.wait_closed(delay):
+                    break
+                delay = min(delay * 2, MAX_DB_RETRY_SECONDS)
+        return None
+
+    def run_job(self, job, db_client, identity_pool):
+        # Returns whether the DB connection is still usable
+        print(f"{self.name} running {job.name}")
+        connected = True
+        start = time.time()
+        try:
+            with maybe_profile(job.name, self.profile):
+                success = job.action(db_client, identity_pool)
+            db_client.commit()
+        except Exception as e:
+            print(f"Job {job.name} failed: {e}")
+            success = False
+            try:
+                db_client.rollback()
+            except psycopg2.Error:
+                try:
+                    db_client.reconnect()
+                except psycopg2.Error as e:
+                    print(f"{self.name} could not reconnect to the database: {e}")
+                    connected = False
+        finished = time.time()
+        self.metrics.record(job.name, success, finished - start, finished)
+
+        next_run = job.next_run(success, finished)
+        if next_run is not None and not self.job_queue.closed:
+            self.job_queue.schedule(job, next_run)
+        return connected
+
+
+class ScraperDaemon:
+    def __init__(self, jobs, workers=1, port=8080, profile=False):
+        self.jobs = jobs
+        self.job_queue = JobQueue()
+        self.metrics = DaemonMetrics()
+        # One set of client identities for all workers, so each identity's rate budget and health hold process wide
+        self.identity_pool = create_identity_pool()
+        self.workers = [
+            Worker(f"worker-{i}", self.job_queue, self.metrics, self.identity_pool, profile) for i in range(workers)
+        ]
+        self.stopping = threading.Event()
+        self.server = ThreadingHTTPServer(("0.0.0.0", port), self._health_handler())
+
+    def start(self):
+        # Everything runs once at startup to catch up, then follows its own schedule
+        now = time.time()
+        for job in self.jobs:
+            self.job_queue.schedule(job, now)
+        for worker in self.workers:
+            worker.start()
+        threading.Thread(target=self.server.serve_forever, name="health", daemon=True).start()
+        print(f"Daemon started with {len(self.workers)} workers, health check on port {self.server.server_port}")
+
+    def stop(self, *args):
+        if not self.stopping.is_set():
+            print("Stopping daemon after the current jobs finish...")
+            self.stopping.set()
+            self.job_queue.close()
+            # Don't let a worker sit out an identity's rest period after being asked to stop
+            self.identity_pool.stop()
+
+    def wait(self):
+        while not self.stopping.wait(1):
+            pass
+        for worker in self.workers:
+            worker.join()
+        self.server.shutdown()
+        self.server.server_close()
+        print("Daemon stopped")
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        self.start()
+        self.wait()
+
+    def health(self):
+        alive = sum(worker.is_alive() for worker in self.workers)
+        healthy = not self.stopping.is_set() and alive == len(self.workers)
+        body = {
+            "status": "ok" if healthy else ("stopping" if self.stopping.is_set() else "degraded"),
+            "workers_alive": alive,
+            "workers": len(self.workers),
+            "queued_jobs": len(self.job_queue),
+            "next_runs": {
+                name: datetime.datetime.fromtimestamp(run_at, datetime.timezone.utc).isoformat()
+                for name, run_at in self.job_queue.next_run_times().items()
+            },
+        }
+        return (200 if healthy else 503), body
+
+    def _health_handler(self):
+        daemon = self
+
+        class HealthHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/health":
+                    status, body = daemon.health()
+                elif self.path == "/metrics":
+                    status, body = 200, daemon.metrics.snapshot()
+                else:
+                    status, body = 404, {"error": "Not found"}
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return HealthHandler
+
+
+def run_daemon(club_id=1832, club_name="Bellahouston Harriers", workers=1, port=8080, metadata_limit=50, profile=False):
+    jobs = [club_scrape_job(club_id, club_name), metadata_job(limit=metadata_limit)]
+    ScraperDaemon(jobs, workers=workers, port=port, profile=profile or profiling_enabled()).run()
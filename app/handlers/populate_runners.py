@@ -1,10 +1,21 @@
 from app.scrapers.club_scraper import ClubScraper
+from app.scrapers.event_scraper import EventScraper
+from app.utils.profiling_utils import profile_handler
 
+DEFAULT_CLUB = {"clubNum": 1832, "clubName": "Bellahouston Harriers"}
 
+
+@profile_handler
 def lambda_handler(event, context):
-    club_id = event.get("clubNum", 1832)
-    club_name = event.get("clubName", "Bellahouston Harriers")
-    print(f"Running populate_runners for club {club_id} ({club_name})")
-    scraper = ClubScraper(club_id=club_id, club_name=club_name)
+    if "events" in event:
+        # Event-centric mode: one request per event and date, shared by every club
+        clubs = {club["clubName"]: club["clubNum"] for club in event.get("clubs", [DEFAULT_CLUB])}
+        print(f"Running populate_runners for {len(clubs)} clubs across events {event['events']}")
+        scraper = EventScraper(clubs=clubs, events=event["events"])
+    else:
+        club_id = event.get("clubNum", DEFAULT_CLUB["clubNum"])
+        club_name = event.get("clubName", DEFAULT_CLUB["clubName"])
+        print(f"Running populate_runners for club {club_id} ({club_name})")
+        scraper = ClubScraper(club_id=club_id, club_name=club_name)
     success = scraper.scrape_recent_results()
     return {"statusCode": 200 if success else 500, "body": "Scrape completed" if success else "Scrape failed"}
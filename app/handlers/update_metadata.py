@@ -1,6 +1,8 @@
 from app.scrapers.runner_scraper import RunnerScraper
+from app.utils.profiling_utils import profile_handler
 
 
+@profile_handler
 def lambda_handler(event, context):
     limit = event.get("limit", 200)
     print(f"Running update_metadata with limit {limit}")
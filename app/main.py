@@ -1,8 +1,38 @@
+import argparse
+
+from app.daemon import run_daemon
 from app.scrapers.club_scraper import ClubScraper
 from app.scrapers.runner_scraper import RunnerScraper
+from app.utils.profiling_utils import maybe_profile, profiling_enabled
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Scrape parkrun club results and runner metadata.")
+    parser.add_argument("--daemon", action="store_true", help="Keep running and scrape on a schedule")
+    parser.add_argument("--club-id", type=int, default=1832)
+    parser.add_argument("--club-name", default="Bellahouston Harriers")
+    parser.add_argument("--workers", type=int, default=1, help="Maximum number of jobs to run at once (daemon only)")
+    parser.add_argument("--port", type=int, default=8080, help="Port for /health and /metrics (daemon only)")
+    parser.add_argument("--profile", action="store_true", help="Profile the run (also enabled by PROFILE=true)")
+    parser.add_argument("--metadata-limit", type=int, default=50, help="Runners per metadata batch (daemon only)")
+    args = parser.parse_args(args)
+
+    if args.daemon:
+        run_daemon(
+            club_id=args.club_id,
+            club_name=args.club_name,
+            workers=args.workers,
+            port=args.port,
+            metadata_limit=args.metadata_limit,
+            profile=args.profile,
+        )
+    else:
+        with maybe_profile("main", args.profile or profiling_enabled()):
+            club_scraper = ClubScraper(club_id=args.club_id, club_name=args.club_name)
+            club_scraper.scrape_recent_results()
+            metadata_scraper = RunnerScraper()
+            metadata_scraper.scrape_missing_metadata()
+
 
 if __name__ == "__main__":
-    club_scraper = ClubScraper()
-    club_scraper.scrape_recent_results()
-    metadata_scraper = RunnerScraper()
-    metadata_scraper.scrape_missing_metadata()
+    main()
@@ -0,0 +1,54 @@
+import datetime
+import requests
+from bs4 import BeautifulSoup
+
+from app.utils.club_matcher import ClubMatcher
+from app.utils.identity_utils import fetch_html
+
+# An event's results page has a single results table, so nothing after it is needed
+EVENT_RESULTS_END_MARKER = "</table>"
+
+
+class EventResult:
+    date: datetime.date
+    success: bool
+    session: requests.Session
+    runner_ids_by_club: dict[str, list[str]]
+    url: str
+
+    def __init__(
+        self, event, date, club_matcher: ClubMatcher, identity_pool=None, session=None, page=None, context=None
+    ):
+        self.session = session
+        self.page = page
+        self.context = context
+        self.identity_pool = identity_pool
+        self.event = event
+        self.date = date
+        self.club_matcher = club_matcher
+        self.runner_ids_by_club = {}
+        self.success = False
+        self.url = f"https://www.parkrun.org.uk/{self.event}/results/{self.date.strftime('%Y-%m-%d')}/"
+
+    def fetch_results(self):
+        html = self.fetch_page()
+        if self.success:
+            self.parse_results(html)
+
+    def fetch_page(self):
+        html, self.success = fetch_html(
+            self.url, EVENT_RESULTS_END_MARKER, self.identity_pool, self.session, self.page, self.context
+        )
+        return html
+
+    def parse_results(self, html_content: str):
+        soup = BeautifulSoup(html_content, "html.parser")
+        for row in soup.find_all("tr"):
+            # Result rows carry the club in a data attribute, fall back to the row text for older layouts
+            club_name = self.club_matcher.match(row.get("data-club") or row.get_text(" "))
+            if not club_name:
+                continue
+            link = row.find("a", href=lambda href: href and "parkrunner" in href)
+            if link:
+                runner_id = link["href"].rstrip("/").split("/")[-1].split("?")[0]
+                self.runner_ids_by_club.setdefault(club_name, []).append(runner_id)
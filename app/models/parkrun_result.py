@@ -2,7 +2,22 @@ import datetime
 import requests
 from bs4 import BeautifulSoup
 
-from app.utils.http_utils import get_html_content
+from app.utils.hash_utils import fingerprint, fingerprint_ids
+from app.utils.identity_utils import fetch_html
+
+# All the results tables come before the page footer, so there's no need to download the rest
+RESULTS_END_MARKER = "<footer"
+RESULTS_START_MARKER = "<table"
+
+
+def results_section(html):
+    # Just the results tables. The rest of the page changes between otherwise identical fetches, for instance the
+    # "Dynamic page generated in 0.807 seconds" comment after the footer, which the browser fallback returns too.
+    start = html.find(RESULTS_START_MARKER)
+    if start == -1:
+        return ""
+    end = html.find(RESULTS_END_MARKER, start)
+    return html[start:] if end == -1 else html[start:end]
 
 
 class ParkrunResult:
@@ -11,23 +26,53 @@ class ParkrunResult:
     session: requests.Session
     runner_ids: list[str]
     url: str
+    page_fingerprint: str | None
+    result_fingerprint: str | None
+    changed: bool
 
-    def __init__(self, session, page, context, date, club_id=1832, club_name="Bellahouston Harriers"):
+    def __init__(
+        self,
+        date,
+        club_id=1832,
+        club_name="Bellahouston Harriers",
+        identity_pool=None,
+        session=None,
+        page=None,
+        context=None,
+    ):
         self.session = session
         self.page = page
         self.context = context
+        self.identity_pool = identity_pool
         self.date = date
         self.club_id = club_id
         self.club_name = club_name
         self.runner_ids = []
         self.success = False
+        self.page_fingerprint = None
+        self.result_fingerprint = None
+        self.changed = True
         self.url = f"https://www.parkrun.com/results/consolidatedclub/?clubNum={self.club_id}&eventdate={self.date.strftime('%Y-%m-%d')}"
 
-    def fetch_results(self):
-        html, success = get_html_content(self.url, self.session, self.page, self.context)
-        if success:
+    def fetch_results(self, previous_page_fingerprint=None):
+        html = self.fetch_page()
+        if self.success:
+            self.process_page(html, previous_page_fingerprint)
+
+    def fetch_page(self):
+        html, self.success = fetch_html(
+            self.url, RESULTS_END_MARKER, self.identity_pool, self.session, self.page, self.context
+        )
+        return html
+
+    def process_page(self, html, previous_page_fingerprint=None):
+        self.page_fingerprint = fingerprint(results_section(html))
+        if self.page_fingerprint == previous_page_fingerprint:
+            # Same page as the last successful scrape, so there is nothing new to parse
+            self.changed = False
+        else:
             self.parse_results(html)
-        self.success = success
+            self.result_fingerprint = fingerprint_ids(self.runner_ids)
 
     def parse_results(self, html_content: str):
         soup = BeautifulSoup(html_content, "html.parser")
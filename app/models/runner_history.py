@@ -0,0 +1,69 @@
+import datetime
+
+
+class RecentRun:
+    event: str
+    event_date: datetime.date
+    run_number: int | None
+    position: int | None
+    time_in_seconds: int | None
+    age_grade: float | None
+    pb: bool
+
+    def __init__(self, event, event_date, run_number, position, time_in_seconds, age_grade, pb):
+        self.event = event
+        self.event_date = event_date
+        self.run_number = run_number
+        self.position = position
+        self.time_in_seconds = time_in_seconds
+        self.age_grade = age_grade
+        self.pb = pb
+
+    def __repr__(self):
+        return f"RecentRun(event='{self.event}', event_date={self.event_date!r}, run_number={self.run_number}, position={self.position}, time_in_seconds={self.time_in_seconds}, age_grade={self.age_grade}, pb={self.pb})"
+
+    def __eq__(self, other):
+        if not isinstance(other, RecentRun):
+            return False
+        return self.params() == other.params()
+
+    def __hash__(self):
+        return hash(tuple(self.params()))
+
+    def params(self):
+        return [
+            self.event,
+            self.event_date,
+            self.run_number,
+            self.position,
+            self.time_in_seconds,
+            self.age_grade,
+            self.pb,
+        ]
+
+
+class EventSummary:
+    event: str
+    runs: int | None
+    best_position: int | None
+    best_time_in_seconds: int | None
+
+    def __init__(self, event, runs, best_position, best_time_in_seconds):
+        self.event = event
+        self.runs = runs
+        self.best_position = best_position
+        self.best_time_in_seconds = best_time_in_seconds
+
+    def __repr__(self):
+        return f"EventSummary(event='{self.event}', runs={self.runs}, best_position={self.best_position}, best_time_in_seconds={self.best_time_in_seconds})"
+
+    def __eq__(self, other):
+        if not isinstance(other, EventSummary):
+            return False
+        return self.params() == other.params()
+
+    def __hash__(self):
+        return hash(tuple(self.params()))
+
+    def params(self):
+        return [self.event, self.runs, self.best_position, self.best_time_in_seconds]
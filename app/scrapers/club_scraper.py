@@ -1,52 +1,88 @@
 import datetime
-import time
-from playwright.sync_api import sync_playwright
 from app.models.parkrun_result import ParkrunResult
-from app.utils.db_utils import DBClient
-from app.utils.http_utils import create_session, init_playwright
+from app.utils.pipeline_utils import PipelineStage
+from app.utils.scrape_utils import recent_scrape_window, run_scrape
 
 
 class ClubScraper:
-    def __init__(self, club_id=1832, club_name="Bellahouston Harriers"):
+    def __init__(self, club_id=1832, club_name="Bellahouston Harriers", write_batch_size=5, queue_size=4):
         self.club_id = club_id
         self.club_name = club_name
+        self.write_batch_size = write_batch_size
+        self.queue_size = queue_size
 
-    def scrape_recent_results(self):
-        start = time.time()
-        with DBClient() as db_client:
-            all_parkrunners = set()
-            success = True
-            with sync_playwright() as playwright_context_manager:
-                session = create_session()
-                browser, page, context = init_playwright(playwright_context_manager)
+    def scrape_recent_results(self, db_client=None, identity_pool=None):
+        return run_scrape(self._scrape, db_client, identity_pool)
 
-                last_scrape_time = db_client.get_last_club_athlete_scrape_time()
-                # Default to 15 days ago if we want to catch up, or use last_scrape_time
-                start_date = (last_scrape_time - datetime.timedelta(days=15)).date()
-                end_date = datetime.date.today()
+    def _scrape(self, db_client, identity_pool):
+        self._db_client = db_client
+        self._pending_parkrunners = set()
+        self._pending_fingerprints = []
+        self._submitted_parkrunners = set()
+        self._new_parkrunners_count = 0
+        self._pages_changed = 0
+        pages_fetched = 0
+        success = True
 
-                print(f"Scraping from {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}")
+        start_date, end_date = recent_scrape_window(db_client)
 
-                current_date = start_date
-                while current_date <= end_date:
-                    parkrun_result = ParkrunResult(session, page, context, current_date, self.club_id, self.club_name)
-                    parkrun_result.fetch_results()
+        print(f"Scraping from {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}")
 
-                    if not parkrun_result.success:
-                        success = False
-                        break
+        fingerprints = db_client.get_page_fingerprints(self.club_id, start_date, end_date)
 
-                    all_parkrunners.update(parkrun_result.runner_ids)
-                    current_date += datetime.timedelta(days=1)
+        # Fetch -> parse -> write, so network waits overlap with parsing and DB writes
+        writer = PipelineStage("write", self._write_page, maxsize=self.queue_size, on_close=self._flush_writes)
+        parser = PipelineStage("parse", self._parse_page, downstream=writer, maxsize=self.queue_size).start()
+        try:
+            current_date = start_date
+            while current_date <= end_date:
+                parkrun_result = ParkrunResult(current_date, self.club_id, self.club_name, identity_pool=identity_pool)
+                # Fetching stays on this thread because the Playwright sync API is bound to it
+                html = parkrun_result.fetch_page()
 
-                if all_parkrunners:
-                    new_parkrunners = db_client.insert_new_parkrunners(all_parkrunners)
-                    db_client.add_last_scrape_metadata(len(new_parkrunners), success)
-                else:
-                    db_client.add_last_scrape_metadata(0, success)
+                if not parkrun_result.success:
+                    success = False
+                    break
 
-                browser.close()
+                pages_fetched += 1
+                parser.put((parkrun_result, html, fingerprints.get(current_date, (None, None))))
+                current_date += datetime.timedelta(days=1)
+        finally:
+            parser.close()
+            parser.join()
 
-        end = time.time()
-        print(f"Total time: {datetime.timedelta(seconds=end - start)}")
+        print(f"Pages changed: {self._pages_changed} of {pages_fetched}")
+        db_client.add_last_scrape_metadata(self._new_parkrunners_count, success, pages_fetched, self._pages_changed)
         return success
+
+    def _parse_page(self, item):
+        parkrun_result, html, (previous_page_fingerprint, previous_result_fingerprint) = item
+        parkrun_result.process_page(html, previous_page_fingerprint)
+        if not parkrun_result.changed:
+            print(f"Results unchanged for {parkrun_result.date.strftime('%Y-%m-%d')}, skipping")
+            return None
+        return parkrun_result, previous_result_fingerprint
+
+    def _write_page(self, item):
+        parkrun_result, previous_result_fingerprint = item
+        self._pending_fingerprints.append(
+            (parkrun_result.date, parkrun_result.page_fingerprint, parkrun_result.result_fingerprint)
+        )
+        # A changed page can still contain the same runners, e.g. when only the layout differs
+        if parkrun_result.result_fingerprint != previous_result_fingerprint:
+            self._pending_parkrunners.update(set(parkrun_result.runner_ids) - self._submitted_parkrunners)
+        if len(self._pending_fingerprints) >= self.write_batch_size:
+            self._flush_writes()
+
+    def _flush_writes(self):
+        if not self._pending_fingerprints:
+            return
+        if self._pending_parkrunners:
+            self._new_parkrunners_count += len(self._db_client.insert_new_parkrunners(self._pending_parkrunners))
+            self._submitted_parkrunners.update(self._pending_parkrunners)
+        self._db_client.save_page_fingerprints(self.club_id, self._pending_fingerprints)
+        # Commit each batch so a failure later in the run doesn't lose the runners found so far
+        self._db_client.commit()
+        self._pages_changed += len(self._pending_fingerprints)
+        self._pending_parkrunners = set()
+        self._pending_fingerprints = []
@@ -0,0 +1,89 @@
+import datetime
+from app.models.event_result import EventResult
+from app.utils.club_matcher import ClubMatcher
+from app.utils.date_utils import parkrun_days
+from app.utils.pipeline_utils import PipelineStage
+from app.utils.scrape_utils import recent_scrape_window, run_scrape
+
+# How far back to look in the clubs' runner histories for the events they attend
+EVENT_HISTORY_DAYS = 90
+
+
+# Fetches each event's results page once per date and fans the runners out to every tracked club, so the number
+# of requests depends on the events our clubs attend rather than on the number of clubs
+class EventScraper:
+    def __init__(self, clubs, events=(), queue_size=4):
+        # clubs maps club name (as it appears in results) to club ID. events are always fetched, on top of the
+        # events the clubs' runners have been to recently.
+        self.clubs = clubs
+        self.events = list(events)
+        self.queue_size = queue_size
+        self.club_matcher = ClubMatcher(clubs.keys())
+
+    def scrape_recent_results(self, db_client=None, identity_pool=None):
+        return run_scrape(self._scrape, db_client, identity_pool)
+
+    def _scrape(self, db_client, identity_pool):
+        self._db_client = db_client
+        self._submitted_parkrunners = set()
+        self._new_parkrunners_count = 0
+        pages_fetched = 0
+        success = True
+
+        start_date, end_date = recent_scrape_window(db_client)
+
+        # Runner histories only show an event once a runner's profile has been refreshed after their first run there,
+        # so a club's first visit to a new event is only picked up by the club-centric scrape or the events list
+        recent_events = db_client.get_club_events(
+            list(self.clubs.values()), start_date - datetime.timedelta(days=EVENT_HISTORY_DAYS)
+        )
+        events = sorted(set(self.events) | set(recent_events))
+
+        print(
+            f"Scraping {len(events)} events for {len(self.clubs)} clubs from {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}"
+        )
+
+        writer = PipelineStage("write", self._write_date, maxsize=self.queue_size)
+        parser = PipelineStage("parse", self._parse_date, downstream=writer, maxsize=self.queue_size).start()
+        try:
+            for event_date in parkrun_days(start_date, end_date):
+                event_results = []
+                for event in events:
+                    event_result = EventResult(event, event_date, self.club_matcher, identity_pool=identity_pool)
+                    html = event_result.fetch_page()
+                    if not event_result.success:
+                        success = False
+                        break
+                    pages_fetched += 1
+                    event_results.append((event_result, html))
+                if not success:
+                    break
+                # Each date is written as a whole, so a failure part way through a date doesn't half-record it
+                parser.put(event_results)
+        finally:
+            parser.close()
+            parser.join()
+
+        # Event pages aren't fingerprinted, so there is no count of changed pages
+        db_client.add_last_scrape_metadata(self._new_parkrunners_count, success, pages_fetched, None)
+        return success
+
+    def _parse_date(self, event_results):
+        runner_ids_by_club = {}
+        for event_result, html in event_results:
+            event_result.parse_results(html)
+            for club_name, runner_ids in event_result.runner_ids_by_club.items():
+                runner_ids_by_club.setdefault(club_name, set()).update(runner_ids)
+        return runner_ids_by_club
+
+    def _write_date(self, runner_ids_by_club):
+        if not runner_ids_by_club:
+            return
+        all_parkrunners = set().union(*runner_ids_by_club.values()) - self._submitted_parkrunners
+        if all_parkrunners:
+            self._new_parkrunners_count += len(self._db_client.insert_new_parkrunners(all_parkrunners))
+            self._submitted_parkrunners.update(all_parkrunners)
+        for club_name, runner_ids in runner_ids_by_club.items():
+            self._db_client.insert_club_runners(self.clubs[club_name], sorted(runner_ids))
+        # Commit each date so a failure later in the run doesn't lose the runners found so far
+        self._db_client.commit()
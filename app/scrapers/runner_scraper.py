@@ -1,42 +1,119 @@
+import datetime
 import requests
+from urllib.parse import parse_qs, urlparse
 from bs4 import BeautifulSoup
-from app.utils.db_utils import DBClient
-from app.utils.http_utils import create_session, init_playwright, get_html_content
-from playwright.sync_api import sync_playwright
+from app.models.runner_history import EventSummary, RecentRun
+from app.utils.scrape_utils import scrape_resources
+
+# The recent runs and event history tables are all before the page footer
+PROFILE_END_MARKER = "<footer"
+# How long to wait before fetching a runner's profile again, by how recently they last ran. Active runners' history
+# changes most weeks, while a runner who hasn't run for a year is unlikely to have anything new.
+HISTORY_REFRESH_SCHEDULE = [
+    (datetime.timedelta(days=30), datetime.timedelta(days=7)),
+    (datetime.timedelta(days=365), datetime.timedelta(days=30)),
+]
+INACTIVE_HISTORY_REFRESH = datetime.timedelta(days=180)
+# Profiles that can't be fetched or have no name (deleted, or persistently blocked) are retried after this, doubling
+# with each consecutive failure, so they don't crowd out refreshes that are due
+FAILED_REFRESH_BACKOFF = datetime.timedelta(hours=1)
+MAX_FAILED_REFRESH_BACKOFF = datetime.timedelta(days=30)
+
+
+def next_history_refresh(recent_runs, now):
+    if recent_runs:
+        since_last_run = now.date() - max(run.event_date for run in recent_runs)
+        for ran_within, refresh_after in HISTORY_REFRESH_SCHEDULE:
+            if since_last_run <= ran_within:
+                return now + refresh_after
+    return now + INACTIVE_HISTORY_REFRESH
+
+
+def parse_int(text):
+    text = text.strip().replace(",", "")
+    return int(text) if text.isdigit() else None
+
+
+def parse_time_in_seconds(text):
+    # Times are m:ss or h:mm:ss
+    parts = text.strip().split(":")
+    if len(parts) < 2 or not all(part.isdigit() for part in parts):
+        return None
+    seconds = 0
+    for part in parts:
+        seconds = seconds * 60 + int(part)
+    return seconds
+
+
+def parse_age_grade(text):
+    try:
+        return float(text.strip().rstrip("%"))
+    except ValueError:
+        return None
+
+
+def parse_event(cell):
+    # Use the event's URL name (e.g. "pollok"), as event-centric scraping does
+    if cell.a and cell.a.get("href"):
+        path = urlparse(cell.a["href"]).path.strip("/")
+        if path:
+            return path.split("/")[0]
+    return cell.get_text(strip=True).lower()
 
 
 class RunnerScraper:
-    def __init__(self):
+    def __init__(self, write_batch_size=20):
         self.base_url = "https://www.parkrun.org.uk/parkrunner/{}/"
+        self.write_batch_size = write_batch_size
+        self.runner_count = 0
 
-    def scrape_missing_metadata(self, limit=200):
-        with DBClient() as db_client:
-            runner_ids = db_client.get_runners_missing_metadata(limit=limit)
+    def scrape_missing_metadata(self, limit=200, db_client=None, identity_pool=None):
+        with scrape_resources(db_client, identity_pool) as (db_client, identity_pool):
+            now = datetime.datetime.now(tz=datetime.timezone.utc)
+            # Runners never fetched before come first, then those whose history is due a refresh
+            runner_ids = db_client.get_runners_due_for_refresh(now, limit=limit)
+            self.runner_count = 0
             if not runner_ids:
-                print("No runners missing metadata.")
+                print("No runners due a profile refresh.")
                 return True
 
-            with sync_playwright() as playwright_context_manager:
-                session = create_session()
-                browser, page, context = init_playwright(playwright_context_manager)
-
-                for runner_id in runner_ids:
-                    url = self.base_url.format(runner_id)
-                    print(f"Scraping metadata for runner {runner_id} from {url}")
-                    html, success = get_html_content(url, session, page, context)
-
-                    if success:
-                        metadata = self.parse_runner_metadata(html)
-                        if metadata.get("name"):
-                            db_client.update_runner_metadata(runner_id, metadata["name"])
-                        else:
-                            print(f"Could not find name for runner {runner_id}")
+            pending_profiles = []
+            pending_failures = []
+            for runner_id in runner_ids:
+                url = self.base_url.format(runner_id)
+                print(f"Scraping metadata for runner {runner_id} from {url}")
+                html, success = identity_pool.get_html_content(url, stop_marker=PROFILE_END_MARKER)
+
+                if success:
+                    metadata = self.parse_runner_metadata(html)
+                    if metadata.get("name"):
+                        refresh_after = next_history_refresh(metadata["recent_runs"], now)
+                        pending_profiles.append((runner_id, metadata, refresh_after))
                     else:
-                        print(f"Failed to fetch metadata for runner {runner_id}")
+                        print(f"Could not find name for runner {runner_id}")
+                        pending_failures.append(runner_id)
+                else:
+                    print(f"Failed to fetch metadata for runner {runner_id}")
+                    pending_failures.append(runner_id)
 
-                browser.close()
+                if len(pending_profiles) + len(pending_failures) >= self.write_batch_size:
+                    self._save_profiles(db_client, pending_profiles, pending_failures, now)
+                    pending_profiles = []
+                    pending_failures = []
+            self._save_profiles(db_client, pending_profiles, pending_failures, now)
         return True
 
+    def _save_profiles(self, db_client, profiles, failures, now):
+        if profiles:
+            db_client.save_runner_profiles(profiles)
+            # Only profiles actually saved count, so a backlog of failing runners doesn't look like work to catch up on
+            self.runner_count += len(profiles)
+        if failures:
+            db_client.defer_runner_refresh(failures, now, FAILED_REFRESH_BACKOFF, MAX_FAILED_REFRESH_BACKOFF)
+        if profiles or failures:
+            # Commit each batch so a failure later in the run doesn't lose the profiles already fetched
+            db_client.commit()
+
     def parse_runner_metadata(self, html_content):
         soup = BeautifulSoup(html_content, "html.parser")
         # Parkrun runner pages usually have the name in an h2
@@ -61,4 +138,70 @@ class RunnerScraper:
             # Make the name Title Case
             name = name.title()
 
-        return {"name": name}
+        club_id, club_name = self.parse_club(soup)
+        recent_runs, event_summaries = self.parse_history(soup)
+        return {
+            "name": name,
+            "club_id": club_id,
+            "club_name": club_name,
+            "recent_runs": recent_runs,
+            "event_summaries": event_summaries,
+        }
+
+    def parse_club(self, soup):
+        # The club links to its consolidated results, which carry the club number
+        link = soup.find("a", href=lambda href: href and "clubNum=" in href)
+        if not link:
+            return None, None
+        club_num = parse_qs(urlparse(link["href"]).query).get("clubNum", [""])[0]
+        return parse_int(club_num), link.get_text(strip=True) or None
+
+    def parse_history(self, soup):
+        recent_runs = []
+        event_summaries = []
+        # The tables are told apart by their column headings, which are more stable than their ids and captions
+        for table in soup.find_all("table"):
+            headings = [th.get_text(strip=True).lower() for th in table.find_all("th")]
+            if "event" not in headings:
+                continue
+            if "run date" in headings:
+                parse_row = self._parse_recent_run
+                records = recent_runs
+            elif "runs" in headings:
+                parse_row = self._parse_event_summary
+                records = event_summaries
+            else:
+                continue
+            for row in table.find_all("tr"):
+                cells = row.find_all("td")
+                if len(cells) < len(headings):
+                    continue
+                record = parse_row(dict(zip(headings, cells)))
+                if record:
+                    records.append(record)
+        return recent_runs, event_summaries
+
+    def _parse_recent_run(self, cells):
+        try:
+            event_date = datetime.datetime.strptime(cells["run date"].get_text(strip=True), "%d/%m/%Y").date()
+        except ValueError:
+            return None
+        return RecentRun(
+            event=parse_event(cells["event"]),
+            event_date=event_date,
+            run_number=parse_int(cells["run number"].get_text()) if "run number" in cells else None,
+            position=parse_int(cells["pos"].get_text()) if "pos" in cells else None,
+            time_in_seconds=parse_time_in_seconds(cells["time"].get_text()) if "time" in cells else None,
+            age_grade=parse_age_grade(cells["age grade"].get_text()) if "age grade" in cells else None,
+            pb="pb" in cells["pb?"].get_text().lower() if "pb?" in cells else False,
+        )
+
+    def _parse_event_summary(self, cells):
+        return EventSummary(
+            event=parse_event(cells["event"]),
+            runs=parse_int(cells["runs"].get_text()),
+            best_position=(
+                parse_int(cells["best position overall"].get_text()) if "best position overall" in cells else None
+            ),
+            best_time_in_seconds=parse_time_in_seconds(cells["best time"].get_text()) if "best time" in cells else None,
+        )
@@ -0,0 +1,16 @@
+import re
+
+
+class ClubMatcher:
+    def __init__(self, club_names):
+        self.club_names = list(club_names)
+        # Longest names first, so a club whose name contains another club's name still matches itself
+        names = sorted(self.club_names, key=len, reverse=True)
+        self.pattern = re.compile("|".join(re.escape(name) for name in names)) if names else None
+
+    def match(self, text):
+        # Returns the tracked club named in the text, or None, with a single scan whatever the number of clubs
+        if not text or not self.pattern:
+            return None
+        match = self.pattern.search(text)
+        return match.group(0) if match else None
@@ -0,0 +1,14 @@
+import datetime
+
+
+def is_parkrun_day(date):
+    # parkruns are on Saturdays, plus the special Christmas Day and New Year's Day events
+    return date.weekday() == 5 or (date.month, date.day) in ((12, 25), (1, 1))
+
+
+def parkrun_days(start_date, end_date):
+    current_date = start_date
+    while current_date <= end_date:
+        if is_parkrun_day(current_date):
+            yield current_date
+        current_date += datetime.timedelta(days=1)
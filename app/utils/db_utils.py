@@ -1,3 +1,5 @@
+import json
+import math
 from datetime import datetime, timezone
 from os import getenv
 from zoneinfo import ZoneInfo
@@ -35,6 +37,23 @@ class DBClient:
             self.conn.commit()
         self.conn.close()
 
+    def commit(self):
+        self.conn.commit()
+
+    def rollback(self):
+        self.conn.rollback()
+
+    def close(self):
+        try:
+            self.conn.close()
+        except psycopg2.Error:
+            pass
+
+    def reconnect(self):
+        # For long-running processes, whose connection can be dropped between jobs
+        self.close()
+        self.conn = init_db()
+
     def get_last_club_athlete_scrape_time(self):
         with self.conn.cursor() as cur:
             cur.execute(
@@ -58,26 +77,141 @@ class DBClient:
         print(new_parkrunners)
         return new_parkrunners
 
-    def add_last_scrape_metadata(self, new_parkrunners_count, success):
+    def insert_club_runners(self, club_id, runner_ids):
+        print(f"Recording {len(runner_ids)} parkrunners for club {club_id}...")
+        with self.conn.cursor() as cur:
+            placeholders = ", ".join(["(%s, %s)"] * len(runner_ids))
+            params = []
+            for runner_id in runner_ids:
+                params.extend([club_id, runner_id])
+            cur.execute(
+                f"INSERT INTO public.club_runners(club_id, runner_id) VALUES {placeholders} ON CONFLICT(club_id, runner_id) DO NOTHING;",
+                params,
+            )
+
+    def get_club_events(self, club_ids, since):
+        # The events any of the clubs' runners have been to since the given date, from their profile histories
+        with self.conn.cursor() as cur:
+            # ANY takes the IDs as one array, so an empty list is still valid SQL and simply matches nothing
+            cur.execute(
+                "SELECT DISTINCT rr.event FROM public.runner_results rr JOIN public.runners r ON r.id = rr.runner_id "
+                "WHERE r.club_id = ANY(%s) AND rr.event_date >= %s ORDER BY rr.event;",
+                (list(club_ids), since),
+            )
+            events = [row[0] for row in cur.fetchall()]
+        print(f"Found {len(events)} events attended by runners from {len(club_ids)} clubs.")
+        return events
+
+    def add_last_scrape_metadata(self, new_parkrunners_count, success, pages_fetched=0, pages_changed=0):
         now = datetime.now(tz=timezone.utc)
         print(
-            f"Adding last scrape metadata...[last_scrape_time: {now.astimezone(ZoneInfo('Europe/London'))}, new_parkrunners_count: {new_parkrunners_count}, success: {success}]"
+            f"Adding last scrape metadata...[last_scrape_time: {now.astimezone(ZoneInfo('Europe/London'))}, new_parkrunners_count: {new_parkrunners_count}, success: {success}, pages_fetched: {pages_fetched}, pages_changed: {pages_changed}]"
         )
         with self.conn.cursor() as cur:
             cur.execute(
-                "INSERT INTO public.last_scrape_metadata (last_scrape_time, new_parkrunners_count, success) VALUES (%s, %s, %s);",
-                (now, new_parkrunners_count, success),
+                "INSERT INTO public.last_scrape_metadata (last_scrape_time, new_parkrunners_count, success, pages_fetched, pages_changed) VALUES (%s, %s, %s, %s, %s);",
+                (now, new_parkrunners_count, success, pages_fetched, pages_changed),
             )
 
-    def get_runners_missing_metadata(self, limit=100):
-        print(f"Fetching up to {limit} runners missing metadata...")
+    def get_page_fingerprints(self, club_id, start_date, end_date):
         with self.conn.cursor() as cur:
-            cur.execute("SELECT id FROM public.runners WHERE name IS NULL LIMIT %s;", (limit,))
+            cur.execute(
+                "SELECT event_date, page_fingerprint, result_fingerprint FROM public.page_fingerprints WHERE club_id = %s AND event_date BETWEEN %s AND %s;",
+                (club_id, start_date, end_date),
+            )
+            fingerprints = {row[0]: (row[1], row[2]) for row in cur.fetchall()}
+        print(f"Found {len(fingerprints)} stored page fingerprints for club {club_id}.")
+        return fingerprints
+
+    def save_page_fingerprints(self, club_id, fingerprints):
+        # fingerprints is a list of (event_date, page_fingerprint, result_fingerprint)
+        print(f"Saving {len(fingerprints)} page fingerprints for club {club_id}...")
+        now = datetime.now(tz=timezone.utc)
+        with self.conn.cursor() as cur:
+            placeholders = ", ".join(["(%s, %s, %s, %s, %s)"] * len(fingerprints))
+            params = []
+            for event_date, page_fingerprint, result_fingerprint in fingerprints:
+                params.extend([club_id, event_date, page_fingerprint, result_fingerprint, now])
+            cur.execute(
+                f"INSERT INTO public.page_fingerprints (club_id, event_date, page_fingerprint, result_fingerprint, updated_at) VALUES {placeholders} "
+                "ON CONFLICT(club_id, event_date) DO UPDATE SET page_fingerprint = EXCLUDED.page_fingerprint, "
+                "result_fingerprint = EXCLUDED.result_fingerprint, updated_at = EXCLUDED.updated_at;",
+                params,
+            )
+
+    def get_runners_due_for_refresh(self, now, limit=100):
+        print(f"Fetching up to {limit} runners due a profile refresh...")
+        with self.conn.cursor() as cur:
+            cur.execute(
+                "SELECT id FROM public.runners WHERE history_refresh_after IS NULL OR history_refresh_after <= %s "
+                "ORDER BY history_refresh_after NULLS FIRST LIMIT %s;",
+                (now, limit),
+            )
             runners = [row[0] for row in cur.fetchall()]
         print(f"Found {len(runners)} runners.")
         return runners
 
-    def update_runner_metadata(self, runner_id, name):
-        print(f"Updating metadata for runner {runner_id}: name={name}")
+    def save_runner_profiles(self, profiles):
+        # profiles is a list of (runner_id, metadata, refresh_after), with metadata as parsed by RunnerScraper
+        print(f"Saving {len(profiles)} runner profiles...")
+        now = datetime.now(tz=timezone.utc)
+        runner_params = [now]
+        results = {}
+        summaries = {}
+        for runner_id, metadata, refresh_after in profiles:
+            runner_params.extend(
+                [runner_id, metadata["name"], metadata["club_id"], metadata["club_name"], refresh_after]
+            )
+            # A single statement can't update the same row twice, so keep one record per key
+            for run in metadata["recent_runs"]:
+                results[(runner_id, run.event, run.event_date)] = [runner_id] + run.params()
+            for summary in metadata["event_summaries"]:
+                summaries[(runner_id, summary.event)] = [runner_id] + summary.params()
+
+        with self.conn.cursor() as cur:
+            placeholders = ", ".join(["(%s, %s, %s::integer, %s, %s::timestamptz)"] * len(profiles))
+            cur.execute(
+                "UPDATE public.runners AS r SET name = v.name, club_id = v.club_id, club_name = v.club_name, "
+                "history_updated_at = %s, history_refresh_after = v.refresh_after, history_failures = 0 "
+                f"FROM (VALUES {placeholders}) AS v(id, name, club_id, club_name, refresh_after) WHERE r.id = v.id;",
+                runner_params,
+            )
+            if results:
+                placeholders = ", ".join(["(%s, %s, %s, %s, %s, %s, %s, %s)"] * len(results))
+                cur.execute(
+                    f"INSERT INTO public.runner_results (runner_id, event, event_date, run_number, position, time_in_seconds, age_grade, pb) VALUES {placeholders} "
+                    "ON CONFLICT(runner_id, event, event_date) DO UPDATE SET run_number = EXCLUDED.run_number, position = EXCLUDED.position, "
+                    "time_in_seconds = EXCLUDED.time_in_seconds, age_grade = EXCLUDED.age_grade, pb = EXCLUDED.pb;",
+                    [param for params in results.values() for param in params],
+                )
+            if summaries:
+                placeholders = ", ".join(["(%s, %s, %s, %s, %s)"] * len(summaries))
+                cur.execute(
+                    f"INSERT INTO public.runner_event_summaries (runner_id, event, runs, best_position, best_time_in_seconds) VALUES {placeholders} "
+                    "ON CONFLICT(runner_id, event) DO UPDATE SET runs = EXCLUDED.runs, best_position = EXCLUDED.best_position, "
+                    "best_time_in_seconds = EXCLUDED.best_time_in_seconds;",
+                    [param for params in summaries.values() for param in params],
+                )
+        print(f"Saved {len(results)} results and {len(summaries)} event summaries.")
+
+    def defer_runner_refresh(self, runner_ids, now, backoff, max_backoff):
+        # The backoff doubles with each consecutive failure, up to max_backoff. The exponent stops growing once that is
+        # reached, as history_failures keeps counting and a large power of two overflows an interval.
+        max_doublings = max(0, math.ceil(math.log2(max_backoff / backoff)))
+        print(f"Deferring the profile refresh for {len(runner_ids)} runners...")
         with self.conn.cursor() as cur:
-            cur.execute("UPDATE public.runners SET name = %s WHERE id = %s;", (name, runner_id))
+            placeholders = ", ".join(["%s"] * len(runner_ids))
+            cur.execute(
+                "UPDATE public.runners SET history_failures = history_failures + 1, "
+                "history_refresh_after = %s + LEAST(%s * power(2, LEAST(history_failures, %s)), %s) "
+                f"WHERE id IN ({placeholders});",
+                [now, backoff, max_doublings, max_backoff] + list(runner_ids),
+            )
+
+    def save_profile_report(self, name, summary, profile_report, allocation_report):
+        print(f"Saving profile report for {name}...")
+        with self.conn.cursor() as cur:
+            cur.execute(
+                "INSERT INTO public.profile_reports (created_at, name, summary, profile_report, allocation_report) VALUES (%s, %s, %s, %s, %s);",
+                (datetime.now(tz=timezone.utc), name, json.dumps(summary), profile_report, allocation_report),
+            )
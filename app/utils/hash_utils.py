@@ -0,0 +1,13 @@
+import hashlib
+
+
+def fingerprint(content):
+    # A stable fingerprint for a page body or a parsed result, so unchanged pages can be skipped
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    return hashlib.sha256(content).hexdigest()
+
+
+def fingerprint_ids(ids):
+    # Order and duplicates don't change the meaning of a set of runner IDs
+    return fingerprint("\n".join(sorted(set(ids))))
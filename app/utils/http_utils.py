@@ -1,6 +1,9 @@
+import codecs
+import re
 import requests
 import time
 import random
+from functools import lru_cache
 from requests.adapters import HTTPAdapter
 from urllib3 import Retry
 from playwright_stealth import Stealth
@@ -9,13 +12,36 @@ COMMON_USER_AGENT = (
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36"
 )
 
-
-def create_session(max_retries=3, backoff_factor=1):
-    session = requests.Session()
-    session.headers = {
-        "User-Agent": COMMON_USER_AGENT,
+# Common bot protection patterns
+BOT_SIGNALS = [
+    "JavaScript is disabled",
+    "detected unusual traffic",
+    "please complete the security check",
+    "was not able to complete your request",
+]
+BOT_SIGNAL_PATTERN = re.compile("|".join(re.escape(signal) for signal in BOT_SIGNALS))
+STREAM_CHUNK_SIZE = 16 * 1024
+RETRY_STATUSES = [408, 425, 429, 500, 502, 503, 504]
+RATE_LIMITED_STATUS = 429
+# After the stop marker the rest of the body is still read, so the connection goes back to the pool for the next
+# request. Only when more than this is left is it cheaper to drop the connection and open a new one.
+EARLY_STOP_MIN_BYTES = 256 * 1024
+
+DEFAULT_CLIENT_HINTS = {
+    "sec-ch-ua": '"Google Chrome";v="131", "Chromium";v="131", "Not_A Brand";v="24"',
+    "sec-ch-ua-mobile": "?0",
+    "sec-ch-ua-platform": '"Windows"',
+}
+
+
+def browser_headers(user_agent=COMMON_USER_AGENT, client_hints=None, accept_language="en-GB,en-US;q=0.9,en;q=0.8"):
+    # Client hints must agree with the User-Agent, so they are passed in together
+    if client_hints is None:
+        client_hints = DEFAULT_CLIENT_HINTS
+    return {
+        "User-Agent": user_agent,
         "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7",
-        "Accept-Language": "en-GB,en-US;q=0.9,en;q=0.8",
+        "Accept-Language": accept_language,
         "Accept-Encoding": "gzip, deflate, br, zstd",
         "Cache-Control": "max-age=0",
         "DNT": "1",
@@ -26,25 +52,28 @@ def create_session(max_retries=3, backoff_factor=1):
         "Sec-Fetch-Site": "none",
         "Sec-Fetch-User": "?1",
         "priority": "u=0, i",
-        "sec-ch-ua": '"Google Chrome";v="131", "Chromium";v="131", "Not_A Brand";v="24"',
-        "sec-ch-ua-mobile": "?0",
-        "sec-ch-ua-platform": '"Windows"',
+        **client_hints,
     }
+
+
+def create_session(max_retries=3, backoff_factor=1, headers=None, proxy=None):
+    session = requests.Session()
+    session.headers = headers or browser_headers()
+    if proxy:
+        session.proxies = {"http": proxy, "https": proxy}
     retries = Retry(
         total=max_retries,
         backoff_factor=backoff_factor,
-        status_forcelist=[408, 425, 429, 500, 502, 503, 504],
+        status_forcelist=RETRY_STATUSES,
+        # Hand back the last response once the retries run out, so a rate limit can be told apart from other errors
+        raise_on_status=False,
     )
     session.mount("https://", HTTPAdapter(max_retries=retries))
     return session
 
 
-def init_playwright(playwright_context_manager):
-    # Use a more realistic viewport and add some variety
-    width = 1280 + random.randint(0, 100)
-    height = 720 + random.randint(0, 100)
-
-    browser = playwright_context_manager.chromium.launch(
+def launch_browser(playwright_context_manager):
+    return playwright_context_manager.chromium.launch(
         headless=True,
         args=[
             "--no-sandbox",
@@ -57,24 +86,35 @@ def init_playwright(playwright_context_manager):
         ],
     )
 
+
+def new_stealth_context(
+    browser, user_agent=COMMON_USER_AGENT, viewport=None, locale="en-GB", timezone_id="Europe/London", proxy=None
+):
+    if viewport is None:
+        # Use a more realistic viewport and add some variety
+        viewport = {"width": 1280 + random.randint(0, 100), "height": 720 + random.randint(0, 100)}
+
     # Parkrun is UK-based, so setting locale and timezone helps look more like a local user
-    context = browser.new_context(
-        user_agent=COMMON_USER_AGENT,
-        viewport={"width": width, "height": height},
-        device_scale_factor=random.choice([1, 1.25, 1.5]),
-        locale="en-GB",
-        timezone_id="Europe/London",
-        accept_downloads=False,
-    )
+    context_options = {
+        "user_agent": user_agent,
+        "viewport": viewport,
+        "device_scale_factor": random.choice([1, 1.25, 1.5]),
+        "locale": locale,
+        "timezone_id": timezone_id,
+        "accept_downloads": False,
+    }
+    if proxy:
+        context_options["proxy"] = {"server": proxy}
+    context = browser.new_context(**context_options)
 
     # Apply stealth to the context
     Stealth().apply_stealth_sync(context)
 
     page = context.new_page()
-    return browser, page, context
+    return page, context
 
 
-def get_html_content(url, session, page, context):
+def get_html_content(url, session, page, context, stop_marker=None, on_bot_detected=None):
     # Add a small random delay before each request to look less like a bot
     # Skip delay in tests to speed them up
     from os import getenv
@@ -83,19 +123,25 @@ def get_html_content(url, session, page, context):
         time.sleep(random.uniform(1, 3))
 
     try:
-        result = session.get(url)
-        html = result.text
-
-        # Check for common bot protection patterns
-        bot_signals = [
-            "JavaScript is disabled",
-            "detected unusual traffic",
-            "please complete the security check",
-            "was not able to complete your request",
-        ]
-
-        if any(signal in html for signal in bot_signals):
+        response = session.get(url, stream=True)
+        if response.status_code in RETRY_STATUSES:
+            response.close()
+            print(f"Failed to fetch results for: {url}. Still getting {response.status_code} after retrying")
+            if response.status_code == RATE_LIMITED_STATUS and on_bot_detected:
+                # Being rate limited is as clear a sign as a challenge page that this client needs to back off
+                on_bot_detected()
+            return None, False
+
+        html, bot_detected = read_html(response, stop_marker)
+
+        if bot_detected:
             print(f"Bot protection detected for: {url}. Attempting with Playwright...")
+            if on_bot_detected:
+                on_bot_detected()
+
+            if page is None:
+                print(f"No browser available to retry: {url}")
+                return html, False
 
             # Give it a bit of a "human" pause before trying Playwright
             if getenv("ENV") != "test":
@@ -124,7 +170,7 @@ def get_html_content(url, session, page, context):
             html = page.content()
 
             # Check if we are still blocked
-            if any(signal in html for signal in bot_signals):
+            if BOT_SIGNAL_PATTERN.search(html):
                 print(f"Bot protection STILL detected for: {url} even after Playwright. Possible IP block.")
                 return html, False
 
@@ -139,3 +185,51 @@ def get_html_content(url, session, page, context):
         success = False
         html = None
     return html, success
+
+
+@lru_cache
+def _stream_pattern(stop_marker):
+    if stop_marker:
+        return re.compile(f"(?P<bot>{BOT_SIGNAL_PATTERN.pattern})|(?P<stop>{re.escape(stop_marker)})")
+    return BOT_SIGNAL_PATTERN
+
+
+def read_html(response, stop_marker=None):
+    # Decode the body as it arrives and scan it once for bot signals and the stop marker together.
+    # A challenge page is abandoned as soon as it is recognised. Once the stop marker is seen, nothing more is
+    # decoded or scanned.
+    pattern = _stream_pattern(stop_marker)
+    # Keep enough of the previous chunk to catch a pattern split across two chunks
+    overlap = max(len(pattern_text) for pattern_text in BOT_SIGNALS + [stop_marker or ""]) - 1
+    decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+    chunks = response.iter_content(chunk_size=STREAM_CHUNK_SIZE)
+    parts = []
+    tail = ""
+    try:
+        for chunk in chunks:
+            text = decoder.decode(chunk)
+            parts.append(text)
+            match = pattern.search(tail + text)
+            if match:
+                bot_detected = match.lastgroup != "stop"
+                if not bot_detected:
+                    _drain(response, chunks)
+                return "".join(parts), bot_detected
+            tail = (tail + text)[-overlap:]
+        text = decoder.decode(b"", final=True)
+        parts.append(text)
+        match = pattern.search(tail + text)
+        return "".join(parts), bool(match and match.lastgroup != "stop")
+    finally:
+        # Releases the connection to the pool if the body was read in full, otherwise drops it
+        response.close()
+
+
+def _drain(response, chunks):
+    # Content-Length and raw.tell() both count the bytes on the wire, so this also holds for compressed bodies
+    content_length = response.headers.get("Content-Length")
+    if content_length and content_length.isdigit():
+        if int(content_length) - response.raw.tell() > EARLY_STOP_MIN_BYTES:
+            return
+    for _ in chunks:
+        pass
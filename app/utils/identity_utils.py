@@ -0,0 +1,243 @@
+import threading
+import time
+from os import getenv
+
+from app.utils.http_utils import (
+    COMMON_USER_AGENT,
+    DEFAULT_CLIENT_HINTS,
+    browser_headers,
+    create_session,
+    get_html_content,
+    launch_browser,
+    new_stealth_context,
+)
+
+# Each profile is a coherent client: the client hints and viewport have to match what the User-Agent claims to be
+IDENTITY_PROFILES = [
+    {
+        "name": "chrome-windows",
+        "user_agent": COMMON_USER_AGENT,
+        "client_hints": DEFAULT_CLIENT_HINTS,
+        "viewport": {"width": 1366, "height": 768},
+    },
+    {
+        "name": "chrome-mac",
+        "user_agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36",
+        "client_hints": {
+            "sec-ch-ua": '"Google Chrome";v="131", "Chromium";v="131", "Not_A Brand";v="24"',
+            "sec-ch-ua-mobile": "?0",
+            "sec-ch-ua-platform": '"macOS"',
+        },
+        "viewport": {"width": 1440, "height": 900},
+    },
+    {
+        "name": "edge-windows",
+        "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36 Edg/131.0.0.0",
+        "client_hints": {
+            "sec-ch-ua": '"Microsoft Edge";v="131", "Chromium";v="131", "Not_A Brand";v="24"',
+            "sec-ch-ua-mobile": "?0",
+            "sec-ch-ua-platform": '"Windows"',
+        },
+        "viewport": {"width": 1536, "height": 864},
+    },
+]
+
+MAX_REST_SECONDS = 60 * 60
+# A fetch fails rather than wait longer than this for an identity, so a pool that is resting can't outlast the caller
+DEFAULT_MAX_WAIT_SECONDS = 60
+
+
+class ClientIdentity:
+    def __init__(
+        self,
+        name,
+        user_agent,
+        client_hints,
+        viewport,
+        locale="en-GB",
+        timezone_id="Europe/London",
+        proxy=None,
+        requests_per_minute=20,
+        burst=3,
+    ):
+        self.name = name
+        self.user_agent = user_agent
+        self.viewport = viewport
+        self.locale = locale
+        self.timezone_id = timezone_id
+        self.proxy = proxy
+        # Each identity has its own session, and so its own cookie jar
+        self.session = create_session(headers=browser_headers(user_agent, client_hints), proxy=proxy)
+        self.health = 1.0
+        self.consecutive_blocks = 0
+        self.rested_until = 0.0
+        # Token bucket: up to `burst` requests at once, refilled at requests_per_minute
+        self.burst = burst
+        self.tokens = float(burst)
+        self.refill_rate = requests_per_minute / 60
+        self.last_refill = None
+
+    def __repr__(self):
+        return f"ClientIdentity(name='{self.name}', health={self.health:.2f}, tokens={self.tokens:.2f})"
+
+    def refill(self, now):
+        if self.last_refill is not None:
+            self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.refill_rate)
+        self.last_refill = now
+
+    def is_available(self, now):
+        self.refill(now)
+        return now >= self.rested_until and self.tokens >= 1
+
+    def next_available(self, now):
+        self.refill(now)
+        budget_ready = now + max(0.0, (1 - self.tokens) / self.refill_rate)
+        return max(self.rested_until, budget_ready)
+
+    def take_token(self, now):
+        self.refill(now)
+        self.tokens -= 1
+
+    def record_success(self):
+        self.consecutive_blocks = 0
+        self.health = min(1.0, self.health + 0.1)
+
+    def record_block(self, now, rest_seconds):
+        self.consecutive_blocks += 1
+        self.health /= 2
+        # Rest for longer each time in a row this identity is challenged
+        rest = min(MAX_REST_SECONDS, rest_seconds * 2 ** (self.consecutive_blocks - 1))
+        self.rested_until = now + rest
+        print(f"Client identity {self.name} drew bot protection, resting for {rest:.0f}s (health {self.health:.2f})")
+
+    def open_browser_context(self, browser):
+        return new_stealth_context(
+            browser,
+            user_agent=self.user_agent,
+            viewport=self.viewport,
+            locale=self.locale,
+            timezone_id=self.timezone_id,
+            proxy=self.proxy,
+        )
+
+
+class IdentityPool:
+    """Shares client identities, with their rate budgets and health, between threads.
+
+    The Playwright sync API is bound to the thread that created it, so each thread that should fall back to a browser
+    passes in its own Playwright with use_playwright(), and gets its own browser and per-identity contexts.
+    """
+
+    def __init__(
+        self,
+        identities,
+        playwright_context_manager=None,
+        rest_seconds=300,
+        max_wait_seconds=DEFAULT_MAX_WAIT_SECONDS,
+        clock=time.monotonic,
+        sleep=None,
+    ):
+        self.identities = identities
+        self.rest_seconds = rest_seconds
+        self.max_wait_seconds = max_wait_seconds
+        self.clock = clock
+        self.stopping = threading.Event()
+        # Waiting on the stopping event lets stop() cut a wait short
+        self.sleep = sleep or self.stopping.wait
+        self.lock = threading.Lock()
+        self._local = threading.local()
+        if playwright_context_manager:
+            self.use_playwright(playwright_context_manager)
+
+    def use_playwright(self, playwright_context_manager):
+        self._local.playwright_context_manager = playwright_context_manager
+        self._local.browser = None
+        self._local.contexts = {}
+
+    def acquire(self):
+        # Returns None if no identity is free within max_wait_seconds, or the pool is stopping
+        while not self.stopping.is_set():
+            with self.lock:
+                now = self.clock()
+                available = [identity for identity in self.identities if identity.is_available(now)]
+                if available:
+                    # Prefer the healthiest identity, then the one with the most budget left, so load is spread
+                    identity = max(available, key=lambda candidate: (candidate.health, candidate.tokens))
+                    identity.take_token(now)
+                    return identity
+                wait = min(identity.next_available(now) for identity in self.identities) - now
+            if wait > self.max_wait_seconds:
+                print(f"All client identities are resting for another {wait:.0f}s, giving up on this request")
+                return None
+            print(f"All client identities are resting or out of budget, waiting {wait:.1f}s")
+            self.sleep(max(wait, 0.01))
+        return None
+
+    def browser_context(self, identity):
+        # Returns this thread's (page, context) for the identity, or (None, None) if it has no browser
+        playwright_context_manager = getattr(self._local, "playwright_context_manager", None)
+        if playwright_context_manager is None:
+            return None, None
+        if identity.name not in self._local.contexts:
+            if self._local.browser is None:
+                self._local.browser = launch_browser(playwright_context_manager)
+            self._local.contexts[identity.name] = identity.open_browser_context(self._local.browser)
+        return self._local.contexts[identity.name]
+
+    def get_html_content(self, url, stop_marker=None):
+        identity = self.acquire()
+        if identity is None:
+            return None, False
+        page, context = self.browser_context(identity)
+
+        blocked = []
+        html, success = get_html_content(
+            url, identity.session, page, context, stop_marker, on_bot_detected=lambda: blocked.append(True)
+        )
+        with self.lock:
+            if blocked and not success:
+                # Only rest an identity the browser couldn't get past either. Without proxies every identity shares
+                # one IP, so resting on every challenge would soon rest them all.
+                identity.record_block(self.clock(), self.rest_seconds)
+            elif success and not blocked:
+                identity.record_success()
+        return html, success
+
+    def stop(self):
+        # Wakes any thread waiting for an identity, and fails any fetch after this
+        self.stopping.set()
+
+    def close(self):
+        # Closes the calling thread's browser, the identities stay usable by other threads
+        browser = getattr(self._local, "browser", None)
+        if browser:
+            browser.close()
+            self._local.browser = None
+            self._local.contexts = {}
+
+
+def fetch_html(url, stop_marker=None, identity_pool=None, session=None, page=None, context=None):
+    # Fetches through the identity pool when there is one, otherwise with the given session and browser
+    if identity_pool:
+        return identity_pool.get_html_content(url, stop_marker=stop_marker)
+    return get_html_content(url, session, page, context, stop_marker=stop_marker)
+
+
+def create_identity_pool(playwright_context_manager=None):
+    # PROXY_URLS is an optional comma separated list of egress proxies, one per identity
+    proxies = [proxy.strip() for proxy in getenv("PROXY_URLS", "").split(",") if proxy.strip()]
+    requests_per_minute = float(getenv("IDENTITY_REQUESTS_PER_MINUTE", "20"))
+    max_wait_seconds = float(getenv("IDENTITY_MAX_WAIT_SECONDS", DEFAULT_MAX_WAIT_SECONDS))
+    identities = []
+    for i in range(max(len(IDENTITY_PROFILES), len(proxies))):
+        profile = dict(IDENTITY_PROFILES[i % len(IDENTITY_PROFILES)])
+        if i >= len(IDENTITY_PROFILES):
+            profile["name"] = f"{profile['name']}-{i}"
+        identities.append(
+            ClientIdentity(
+                **profile,
+                proxy=proxies[i % len(proxies)] if proxies else None,
+                requests_per_minute=requests_per_minute,
+            )
+        )
+    return IdentityPool(identities, playwright_context_manager, max_wait_seconds=max_wait_seconds)
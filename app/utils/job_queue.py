@@ -0,0 +1,69 @@
+import heapq
+import itertools
+import random
+import threading
+import time
+
+
+class Job:
+    def __init__(self, name, action, next_run, priority=10, jitter=0.0):
+        # action(db_client, identity_pool) returns success, next_run(success, now) returns the next run time or None
+        self.name = name
+        self.action = action
+        self.next_run = next_run
+        self.priority = priority
+        self.jitter = jitter
+        self.run_at = None
+
+    def __repr__(self):
+        return f"Job(name='{self.name}', priority={self.priority}, run_at={self.run_at})"
+
+
+class JobQueue:
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        # Jobs waiting for their run time, ordered by time, and due jobs, ordered by priority (lowest first)
+        self._pending = []
+        self._ready = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self.closed = False
+
+    def __len__(self):
+        with self._condition:
+            return len(self._pending) + len(self._ready)
+
+    def schedule(self, job, run_at):
+        # Jitter spreads the start time so jobs don't hit the site on a fixed, recognisable schedule
+        job.run_at = run_at + random.uniform(0, job.jitter)
+        with self._condition:
+            heapq.heappush(self._pending, (job.run_at, next(self._sequence), job))
+            self._condition.notify()
+
+    def get(self):
+        # Blocks until a job is due and returns the most important one, or None once the queue is closed
+        with self._condition:
+            while not self.closed:
+                now = self.clock()
+                while self._pending and self._pending[0][0] <= now:
+                    run_at, sequence, job = heapq.heappop(self._pending)
+                    heapq.heappush(self._ready, (job.priority, run_at, sequence, job))
+                if self._ready:
+                    return heapq.heappop(self._ready)[-1]
+                timeout = self._pending[0][0] - now if self._pending else None
+                self._condition.wait(timeout)
+            return None
+
+    def next_run_times(self):
+        with self._condition:
+            return {job.name: job.run_at for _, _, job in self._pending}
+
+    def wait_closed(self, timeout):
+        # Sleeps for up to timeout seconds, waking early if the queue is closed, and returns whether it is closed
+        with self._condition:
+            return self._condition.wait_for(lambda: self.closed, timeout)
+
+    def close(self):
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
@@ -0,0 +1,100 @@
+import queue
+import threading
+
+from app.utils.profiling_utils import current_profiler
+
+_CLOSED = object()
+
+
+class PipelineStage:
+    """A worker thread that applies handler to each item in a bounded inbox and forwards results downstream.
+
+    Returning None from the handler forwards nothing. on_close runs once the inbox is drained, which lets a
+    batching stage flush what it has buffered. If any stage fails, items are discarded from then on but the
+    downstream stages are still closed normally, so work that already got through is kept.
+    """
+
+    def __init__(self, name, handler, downstream=None, maxsize=4, on_close=None):
+        self.name = name
+        self.handler = handler
+        self.downstream = downstream
+        self.on_close = on_close
+        self.error = None
+        self.inbox = queue.Queue(maxsize=maxsize)
+        # cProfile only sees the thread it was enabled on (and from Python 3.12 only one can be active at a time),
+        # so while the creating thread is being profiled the stage runs inline on it instead of on its own thread
+        self.inline = current_profiler() is not None
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+    def start(self):
+        if self.downstream:
+            self.downstream.start()
+        if not self.inline:
+            self.thread.start()
+        return self
+
+    def put(self, item):
+        if self.inline:
+            self.raise_if_failed()
+            self._handle(item)
+            return
+        # Block while the stage is busy, but stop waiting as soon as it (or anything after it) has failed
+        while True:
+            self.raise_if_failed()
+            try:
+                self.inbox.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def close(self):
+        if self.inline:
+            self._finish()
+        else:
+            self.inbox.put(_CLOSED)
+
+    def join(self):
+        if not self.inline:
+            self.thread.join()
+        if self.downstream:
+            self.downstream.join()
+        self.raise_if_failed()
+
+    def raise_if_failed(self):
+        # A failure downstream also fails the stages feeding it, so report the furthest one as the root cause
+        failed = None
+        stage = self
+        while stage:
+            if stage.error:
+                failed = stage
+            stage = stage.downstream
+        if failed:
+            raise RuntimeError(f"Pipeline stage '{failed.name}' failed") from failed.error
+
+    def _run(self):
+        while True:
+            item = self.inbox.get()
+            if item is _CLOSED:
+                break
+            if not self.error:
+                self._handle(item)
+        self._finish()
+
+    def _handle(self, item):
+        try:
+            result = self.handler(item)
+            if result is not None and self.downstream:
+                self.downstream.put(result)
+        except Exception as e:
+            print(f"Pipeline stage '{self.name}' failed: {e}")
+            self.error = e
+
+    def _finish(self):
+        if self.on_close and not self.error:
+            try:
+                self.on_close()
+            except Exception as e:
+                print(f"Pipeline stage '{self.name}' failed: {e}")
+                self.error = e
+        if self.downstream:
+            self.downstream.close()
@@ -0,0 +1,171 @@
+import cProfile
+import datetime
+import functools
+import io
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import nullcontext
+from os import getenv
+
+# Where self time goes, matched against each profiled function's file and name
+CATEGORIES = {
+    "beautifulsoup": ("bs4", "html/parser", "_markupbase"),
+    "playwright": ("playwright", "greenlet"),
+    "sleep": ("time.sleep",),
+    "postgres": ("psycopg2",),
+    "network": ("requests", "urllib3", "socket", "ssl"),
+}
+HOTSPOT_COUNT = 5
+ALLOCATION_COUNT = 3
+
+_current = threading.local()
+# cProfile can only have one profiler active at a time (per process from Python 3.12), so profiling is first come,
+# first served and anything that overlaps runs unprofiled. tracemalloc is process wide too, and is only started and
+# stopped while holding this.
+_active = threading.Lock()
+
+
+def profiling_enabled(event=None):
+    # Opt in per invocation with {"profile": true}, or for every invocation with PROFILE=true
+    if event and event.get("profile"):
+        return True
+    return getenv("PROFILE", "").lower() in ("1", "true", "yes")
+
+
+def current_profiler():
+    return getattr(_current, "profiler", None)
+
+
+class Profiler:
+    def __init__(self, name, output=None):
+        self.name = name
+        # A directory to write the reports to, or "db" to store them in public.profile_reports
+        self.output = output or getenv("PROFILE_OUTPUT", "/tmp")
+        self.profile = cProfile.Profile()
+        self.summary = None
+
+    def __enter__(self):
+        self.active = _active.acquire(blocking=False)
+        if not self.active:
+            print(f"Another profile is already running, not profiling {self.name}")
+            return self
+        # Leave tracemalloc running afterwards if something outside this module started it
+        self.started_tracemalloc = not tracemalloc.is_tracing()
+        try:
+            if self.started_tracemalloc:
+                tracemalloc.start()
+            self.start_snapshot = tracemalloc.take_snapshot()
+            tracemalloc.reset_peak()
+            self.start = time.perf_counter()
+            self.profile.enable()
+        except Exception as e:
+            # e.g. another profiling tool, outside this module, is already active
+            print(f"Could not profile {self.name}: {e}")
+            self._release()
+            return self
+        _current.profiler = self
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if not self.active:
+            return False
+        self.profile.disable()
+        duration = time.perf_counter() - self.start
+        _current.profiler = None
+        try:
+            end_snapshot = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            self._release()
+
+        stats = pstats.Stats(self.profile)
+        allocations = end_snapshot.compare_to(self.start_snapshot, "lineno")
+        self.summary = summarise(stats, allocations, duration, peak)
+        try:
+            self.summary["report"] = self.save(stats, allocations)
+        except Exception as e:
+            print(f"Failed to save profile for {self.name}: {e}")
+        print(f"Profile for {self.name}: {self.summary}")
+        return False
+
+    def _release(self):
+        if self.started_tracemalloc:
+            tracemalloc.stop()
+        self.active = False
+        _active.release()
+
+    def save(self, stats, allocations):
+        profile_report = io.StringIO()
+        pstats.Stats(self.profile, stream=profile_report).sort_stats("cumulative").print_stats(50)
+        allocation_report = "\n".join(str(allocation) for allocation in allocations[:25])
+
+        if self.output == "db":
+            # Imported here so profiling doesn't pull in the DB driver unless it is used
+            from app.utils.db_utils import DBClient
+
+            with DBClient() as db_client:
+                db_client.save_profile_report(self.name, self.summary, profile_report.getvalue(), allocation_report)
+            return "db"
+
+        os.makedirs(self.output, exist_ok=True)
+        timestamp = datetime.datetime.now(tz=datetime.timezone.utc).strftime("%Y%m%dT%H%M%S")
+        prefix = os.path.join(self.output, f"{self.name}-{timestamp}")
+        # The .prof file can be opened with pstats or snakeviz for the full picture
+        stats.dump_stats(f"{prefix}.prof")
+        with open(f"{prefix}-profile.txt", "w", encoding="utf-8") as f:
+            f.write(profile_report.getvalue())
+        with open(f"{prefix}-allocations.txt", "w", encoding="utf-8") as f:
+            f.write(allocation_report)
+        return f"{prefix}.prof"
+
+
+def summarise(stats, allocations, duration, peak):
+    categories = {category: 0.0 for category in CATEGORIES}
+    hotspots = []
+    for (filename, line, function), (_, _, self_time, cumulative_time, _) in stats.stats.items():
+        location = f"{filename}:{function}"
+        for category, markers in CATEGORIES.items():
+            if any(marker in location for marker in markers):
+                categories[category] += self_time
+                break
+        hotspots.append((self_time, cumulative_time, f"{short_path(filename)}:{line}({function})"))
+    hotspots.sort(reverse=True)
+    return {
+        "duration_seconds": round(duration, 3),
+        "peak_memory_mb": round(peak / 1024 / 1024, 2),
+        "categories": {category: round(seconds, 3) for category, seconds in categories.items()},
+        "hotspots": [
+            f"{location} self={self_time:.3f}s total={cumulative_time:.3f}s"
+            for self_time, cumulative_time, location in hotspots[:HOTSPOT_COUNT]
+        ],
+        "top_allocations": [str(allocation) for allocation in allocations[:ALLOCATION_COUNT]],
+    }
+
+
+def short_path(filename):
+    # Keep the part of a site-packages path that identifies the library
+    if "site-packages/" in filename:
+        return filename.split("site-packages/", 1)[1]
+    return os.path.basename(filename)
+
+
+def maybe_profile(name, enabled):
+    return Profiler(name) if enabled else nullcontext()
+
+
+def profile_handler(handler):
+    # Wraps a Lambda handler so {"profile": true} or PROFILE=true adds a hotspot summary to the response
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        if not profiling_enabled(event):
+            return handler(event, context)
+        with Profiler(handler.__module__.rsplit(".", 1)[-1]) as profiler:
+            response = handler(event, context)
+        if profiler.summary:
+            response["profile"] = profiler.summary
+        return response
+
+    return wrapper
@@ -0,0 +1,42 @@
+import datetime
+import time
+from contextlib import ExitStack, contextmanager
+
+from playwright.sync_api import sync_playwright
+
+from app.utils.db_utils import DBClient
+from app.utils.identity_utils import create_identity_pool
+
+# Results can be corrected or filled in for a while after the day, so each scrape goes back this far before the last one
+RESCRAPE_DAYS = 15
+
+
+@contextmanager
+def scrape_resources(db_client=None, identity_pool=None):
+    # Yields (db_client, identity_pool). A long-running caller can pass in its own DB client and identity pool to keep
+    # them between scrapes, anything not passed in is opened here and closed again on exit.
+    with ExitStack() as stack:
+        if db_client is None:
+            db_client = stack.enter_context(DBClient())
+        if identity_pool is None:
+            playwright_context_manager = stack.enter_context(sync_playwright())
+            identity_pool = create_identity_pool(playwright_context_manager)
+            stack.callback(identity_pool.close)
+        yield db_client, identity_pool
+
+
+def run_scrape(scrape, db_client=None, identity_pool=None):
+    # Runs scrape(db_client, identity_pool) with scrape_resources() and reports how long it took
+    start = time.time()
+    with scrape_resources(db_client, identity_pool) as (db_client, identity_pool):
+        success = scrape(db_client, identity_pool)
+
+    end = time.time()
+    print(f"Total time: {datetime.timedelta(seconds=end - start)}")
+    return success
+
+
+def recent_scrape_window(db_client):
+    # The dates to scrape, from RESCRAPE_DAYS before the last scrape up to today
+    last_scrape_time = db_client.get_last_club_athlete_scrape_time()
+    return (last_scrape_time - datetime.timedelta(days=RESCRAPE_DAYS)).date(), datetime.date.today()
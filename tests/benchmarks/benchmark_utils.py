@@ -0,0 +1,101 @@
+import json
+import os
+import statistics
+import timeit
+import unittest
+from contextlib import redirect_stdout
+from functools import lru_cache
+from os import getenv
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+# A benchmark fails if it is this many times slower than its baseline
+DEFAULT_THRESHOLD = 1.5
+REPEAT = 7
+# Each sample repeats the code until it takes at least this long, so timer resolution and one-off hiccups wash out
+MIN_SAMPLE_SECONDS = 0.1
+
+
+def calibration_workload():
+    # A fixed pure Python workload. Timings are stored relative to it, so a baseline recorded on one machine
+    # can gate runs on a faster or slower one.
+    sorted(str(i) for i in range(20000))
+
+
+def iterations(func):
+    number = 1
+    while timeit.timeit(func, number=number) < MIN_SAMPLE_SECONDS:
+        number *= 2
+    return number
+
+
+@lru_cache
+def calibration_iterations():
+    return iterations(calibration_workload)
+
+
+def measure(func, repeat=REPEAT):
+    # Each sample of the code is paired with a calibration sample taken right next to it, so a change in machine
+    # load affects both sides of the ratio. The medians are the least disturbed by the rest of the machine.
+    # The code under test prints progress, which would otherwise flood the output and time the terminal.
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        number = iterations(func)
+        calibration_number = calibration_iterations()
+        times = []
+        ratios = []
+        for _ in range(repeat):
+            calibration = timeit.timeit(calibration_workload, number=calibration_number) / calibration_number
+            seconds = timeit.timeit(func, number=number) / number
+            times.append(seconds)
+            ratios.append(seconds / calibration)
+    return statistics.median(times), statistics.median(ratios)
+
+
+def load_baseline():
+    if not os.path.exists(BASELINE_PATH):
+        return {}
+    with open(BASELINE_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baseline(baseline):
+    with open(BASELINE_PATH, "w", encoding="utf-8") as f:
+        json.dump(dict(sorted(baseline.items())), f, indent=2)
+        f.write("\n")
+
+
+class BenchmarkCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.baseline = load_baseline()
+        cls.update_baseline = getenv("BENCHMARK_UPDATE_BASELINE", "").lower() in ("1", "true", "yes")
+        # CI sets this so a benchmark added without a baseline fails, rather than skipping and never being gated
+        cls.require_baseline = getenv("BENCHMARK_REQUIRE_BASELINE", "").lower() in ("1", "true", "yes")
+        cls.threshold = float(getenv("BENCHMARK_THRESHOLD", DEFAULT_THRESHOLD))
+        cls.results = {}
+
+    @classmethod
+    def tearDownClass(cls):
+        if cls.update_baseline and cls.results:
+            baseline = load_baseline()
+            baseline.update(cls.results)
+            save_baseline(baseline)
+
+    def assertNoRegression(self, name, func):
+        seconds, relative = measure(func)
+        self.results[name] = {"seconds": round(seconds, 6), "relative": round(relative, 4)}
+        print(f"{name}: {seconds * 1000:.3f} ms ({relative:.3f}x calibration)")
+        if self.update_baseline:
+            return
+
+        expected = self.baseline.get(name)
+        if expected is None:
+            message = f"No baseline for {name}, record one with BENCHMARK_UPDATE_BASELINE=true"
+            if self.require_baseline:
+                self.fail(message)
+            self.skipTest(message)
+        limit = expected["relative"] * self.threshold
+        self.assertLessEqual(
+            relative,
+            limit,
+            f"{name} regressed: {relative:.3f}x calibration against a baseline of {expected['relative']:.3f}x",
+        )
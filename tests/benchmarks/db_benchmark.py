@@ -0,0 +1,76 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+import psycopg2
+
+from app.utils.db_utils import DBClient
+from tests.benchmarks.benchmark_utils import BenchmarkCase
+
+ID_COUNTS = (1000, 10000)
+# Only ever run against a database on this machine, as the benchmark writes to public.runners
+LOCAL_HOSTS = ("localhost", "127.0.0.1", "::1")
+
+
+def runner_ids(count):
+    # Well clear of real parkrun IDs, and rolled back after every run anyway
+    return [str(900000000 + i) for i in range(count)]
+
+
+class InsertNewParkrunnersSqlBenchmark(BenchmarkCase):
+    @patch("psycopg2.connect")
+    def test_sql_construction(self, mock_connect):
+        cursor = MagicMock()
+        cursor.__enter__.return_value = cursor
+        mock_connect.return_value.cursor.return_value = cursor
+        db_client = DBClient()
+        for count in ID_COUNTS:
+            ids = runner_ids(count)
+            with self.subTest(ids=count):
+                self.assertNoRegression(
+                    f"insert_new_parkrunners[{count} ids, construction]", lambda: db_client.insert_new_parkrunners(ids)
+                )
+
+
+class InsertNewParkrunnersDbBenchmark(BenchmarkCase):
+    # Only runs against a local Postgres, so it never runs in CI and its baseline isn't in baseline.json until someone
+    # records it on a machine with one. Until then it skips, and isn't gating anything.
+    @classmethod
+    def setUpClass(cls):
+        try:
+            cls.db_client = DBClient()
+        except psycopg2.OperationalError as e:
+            raise unittest.SkipTest(f"No local Postgres available, the execution benchmark is not gated: {e}")
+        host = cls.db_client.conn.info.host
+        # A Unix socket path is local too
+        if host not in LOCAL_HOSTS and not host.startswith("/"):
+            cls.db_client.conn.close()
+            raise unittest.SkipTest(f"{host} is not a local Postgres")
+        with cls.db_client.conn.cursor() as cur:
+            cur.execute("SELECT to_regclass('public.runners');")
+            has_runners_table = cur.fetchone()[0] is not None
+        cls.db_client.rollback()
+        if not has_runners_table:
+            cls.db_client.conn.close()
+            raise unittest.SkipTest("public.runners does not exist in the local database")
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.db_client.conn.close()
+
+    def insert_and_roll_back(self, ids):
+        self.db_client.insert_new_parkrunners(ids)
+        self.db_client.rollback()
+
+    def test_execution(self):
+        for count in ID_COUNTS:
+            ids = runner_ids(count)
+            with self.subTest(ids=count):
+                self.assertNoRegression(
+                    f"insert_new_parkrunners[{count} ids, execution]", lambda: self.insert_and_roll_back(ids)
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import datetime
+import unittest
+
+from app.models.parkrun_result import ParkrunResult
+from app.scrapers.runner_scraper import RunnerScraper
+from tests.benchmarks.benchmark_utils import BenchmarkCase
+from tests.benchmarks.synthetic_pages import consolidated_club_page, runner_profile_page
+from tests.parkrun_result_test import load_file_data
+
+RESULT_FIXTURES = [
+    "daily_result_no_runners.html",
+    "daily_result_one_parkrun_one_runner.html",
+    "daily_result_one_parkrun_multiple_runners.html",
+    "daily_result_multiple_parkruns_multiple_runners.html",
+]
+
+
+def parse_results(html):
+    ParkrunResult(datetime.date(2025, 10, 11)).parse_results(html)
+
+
+class ParseResultsBenchmark(BenchmarkCase):
+    def test_fixtures(self):
+        for fixture in RESULT_FIXTURES:
+            html = load_file_data(fixture)
+            with self.subTest(fixture=fixture):
+                self.assertNoRegression(f"parse_results[{fixture}]", lambda: parse_results(html))
+
+    def test_synthetic_pages(self):
+        for rows in (1000, 5000):
+            html = consolidated_club_page(rows)
+            with self.subTest(rows=rows):
+                self.assertNoRegression(f"parse_results[{rows} rows]", lambda: parse_results(html))
+
+
+class ParseRunnerMetadataBenchmark(BenchmarkCase):
+    def setUp(self):
+        self.scraper = RunnerScraper()
+
+    def test_fixture(self):
+        html = load_file_data("runner_profile.html")
+        self.assertNoRegression(
+            "parse_runner_metadata[runner_profile.html]", lambda: self.scraper.parse_runner_metadata(html)
+        )
+
+    def test_synthetic_pages(self):
+        for runs in (1000, 5000):
+            html = runner_profile_page(runs)
+            with self.subTest(runs=runs):
+                self.assertNoRegression(
+                    f"parse_runner_metadata[{runs} runs]", lambda: self.scraper.parse_runner_metadata(html)
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import math
+
+from tests.parkrun_result_test import load_file_data
+
+CLUBS = ["Bellahouston Harriers", "Unattached", "Shettleston Harriers", "Garscube Harriers"]
+EVENTS = ["pollok", "strathclyde", "victoria", "linwood", "tollcross"]
+
+
+def consolidated_club_page(rows):
+    # The real page's head and footer around one results table per event, a quarter of the rows for the club
+    template = load_file_data("daily_result_multiple_parkruns_multiple_runners.html")
+    start = template.rindex("<h2>", 0, template.index("<table"))
+    end = template.rindex("</table>") + len("</table>")
+    sections = []
+    per_event = math.ceil(rows / len(EVENTS))
+    for event_index, event in enumerate(EVENTS):
+        table_rows = []
+        for position in range(1, min(per_event, rows - event_index * per_event) + 1):
+            runner_id = 100000 + event_index * per_event + position
+            club = CLUBS[position % len(CLUBS)]
+            table_rows.append(
+                f"<tr><td>{position}</td><td>{position}</td>"
+                f'<td><a href="https://www.parkrun.org.uk/{event}/parkrunner/{runner_id}">Runner {runner_id}</a></td>'
+                f'<td><a href="http://www.example.com/">{club} </a></td>'
+                f"<td>00:{20 + position % 30}:{position % 60:02d}</td></tr>"
+            )
+        sections.append(
+            f"<h2>{event.title()} parkrun</h2><p>A total of {len(table_rows)} parkrunners took part.</p>"
+            f'<table class="sortable" id="results-{event_index}"><tr><th>Position</th><th>Gender Position</th>'
+            f"<th>parkrunner</th><th>Club</th><th>Time</th></tr>{''.join(table_rows)}</table>"
+        )
+    return template[:start] + "".join(sections) + template[end:]
+
+
+def runner_profile_page(runs):
+    # The real profile page with its recent runs table stretched to the given number of runs
+    template = load_file_data("runner_profile.html")
+    start = template.index("<tbody>") + len("<tbody>")
+    end = template.index("</tbody>")
+    table_rows = []
+    for run in range(runs):
+        event = EVENTS[run % len(EVENTS)]
+        day = run % 28 + 1
+        month = run // 28 % 12 + 1
+        year = 2024 - run // (28 * 12)
+        table_rows.append(
+            f'<tr><td><a href="https://www.parkrun.org.uk/{event}/results">{event.title()}</a></td>'
+            f'<td><a href="https://www.parkrun.org.uk/{event}/results/{run}/">'
+            f'<span class="format-date">{day:02d}/{month:02d}/{year}</span></a></td>'
+            f"<td>{run}</td><td>{run % 300 + 1}</td><td>{20 + run % 10}:{run % 60:02d}</td>"
+            f"<td>{50 + run % 20}.{run % 100:02d}%</td><td>{'PB' if run % 50 == 0 else ''}</td></tr>"
+        )
+    return template[:start] + "".join(table_rows) + template[end:]
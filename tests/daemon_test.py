@@ -0,0 +1,225 @@
+import datetime
+import json
+import threading
+import unittest
+import urllib.request
+from unittest.mock import patch, Mock
+from urllib.error import HTTPError
+
+import psycopg2
+
+from app.daemon import (
+    LONDON,
+    ScraperDaemon,
+    Worker,
+    DaemonMetrics,
+    club_scrape_job,
+    metadata_job,
+    next_club_scrape_time,
+)
+from app.utils.job_queue import Job, JobQueue
+
+
+def london_timestamp(*args):
+    return datetime.datetime(*args, tzinfo=LONDON).timestamp()
+
+
+class NextClubScrapeTimeTest(unittest.TestCase):
+    def test_scrapes_several_times_on_saturday(self):
+        # 2025-10-18 is a Saturday
+        self.assertEqual(london_timestamp(2025, 10, 18, 14), next_club_scrape_time(london_timestamp(2025, 10, 18, 12)))
+        self.assertEqual(london_timestamp(2025, 10, 18, 22), next_club_scrape_time(london_timestamp(2025, 10, 18, 18)))
+
+    def test_scrapes_once_on_other_days(self):
+        self.assertEqual(london_timestamp(2025, 10, 19, 1), next_club_scrape_time(london_timestamp(2025, 10, 18, 23)))
+        self.assertEqual(london_timestamp(2025, 10, 21, 1), next_club_scrape_time(london_timestamp(2025, 10, 20, 2)))
+
+    def test_christmas_day_is_an_event_day(self):
+        self.assertEqual(london_timestamp(2025, 12, 25, 11), next_club_scrape_time(london_timestamp(2025, 12, 25, 2)))
+
+
+class JobTest(unittest.TestCase):
+    @patch("app.daemon.ClubScraper")
+    def test_club_scrape_job_retries_sooner_on_failure(self, mock_club_scraper):
+        job = club_scrape_job(1832, "Bellahouston Harriers")
+        now = london_timestamp(2025, 10, 20, 2)
+
+        self.assertEqual(london_timestamp(2025, 10, 21, 1), job.next_run(True, now))
+        self.assertEqual(now + 30 * 60, job.next_run(False, now))
+        self.assertEqual("club-1832", job.name)
+
+    @patch("app.daemon.ClubScraper")
+    def test_club_scrape_job_uses_shared_resources(self, mock_club_scraper):
+        job = club_scrape_job(1832, "Bellahouston Harriers")
+        db_client, identity_pool = Mock(), Mock()
+        job.action(db_client, identity_pool)
+
+        mock_club_scraper.return_value.scrape_recent_results.assert_called_with(db_client, identity_pool)
+
+    @patch("app.daemon.RunnerScraper")
+    def test_metadata_job_continues_through_backlog(self, mock_runner_scraper):
+        job = metadata_job(limit=50)
+        mock_runner_scraper.return_value.runner_count = 50
+        self.assertEqual(1060, job.next_run(True, 1000))
+
+        mock_runner_scraper.return_value.runner_count = 3
+        self.assertEqual(4600, job.next_run(True, 1000))
+
+
+class WorkerTest(unittest.TestCase):
+    def setUp(self):
+        self.job_queue = JobQueue()
+        self.metrics = DaemonMetrics()
+        self.identity_pool = Mock()
+        self.worker = Worker("worker-0", self.job_queue, self.metrics, self.identity_pool)
+        self.db_client = Mock()
+
+    def test_successful_job_is_committed_and_rescheduled(self):
+        job = Job("club", Mock(return_value=True), Mock(return_value=5000))
+        self.worker.run_job(job, self.db_client, Mock())
+
+        self.db_client.commit.assert_called_once()
+        self.assertEqual({"club": 5000}, self.job_queue.next_run_times())
+        self.assertEqual({"runs": 1, "failures": 0}, {k: self.metrics.jobs["club"][k] for k in ("runs", "failures")})
+
+    def test_failed_job_is_rolled_back(self):
+        next_run = Mock(return_value=None)
+        job = Job("club", Mock(side_effect=ValueError("Boom")), next_run)
+        self.worker.run_job(job, self.db_client, Mock())
+
+        self.db_client.rollback.assert_called_once()
+        next_run.assert_called_once()
+        self.assertFalse(next_run.call_args[0][0])
+        self.assertEqual(1, self.metrics.jobs["club"]["failures"])
+        self.assertEqual(0, len(self.job_queue))
+
+    def test_lost_connection_is_reconnected(self):
+        self.db_client.rollback.side_effect = psycopg2.InterfaceError("connection already closed")
+        job = Job("club", Mock(side_effect=psycopg2.OperationalError("server closed")), Mock(return_value=None))
+        connected = self.worker.run_job(job, self.db_client, Mock())
+
+        self.db_client.reconnect.assert_called_once()
+        self.assertTrue(connected)
+
+    def test_failed_reconnect_is_reported(self):
+        self.db_client.rollback.side_effect = psycopg2.InterfaceError("connection already closed")
+        self.db_client.reconnect.side_effect = psycopg2.OperationalError("could not connect")
+        job = Job("club", Mock(side_effect=psycopg2.OperationalError("server closed")), Mock(return_value=None))
+
+        self.assertFalse(self.worker.run_job(job, self.db_client, Mock()))
+        self.assertEqual(1, self.metrics.jobs["club"]["failures"])
+
+    @patch("app.daemon.DB_RETRY_SECONDS", 0.01)
+    @patch("app.daemon.DBClient")
+    def test_connect_retries_through_an_outage(self, mock_db_client):
+        db_client = Mock()
+        mock_db_client.side_effect = [psycopg2.OperationalError("down"), psycopg2.OperationalError("down"), db_client]
+
+        self.assertIs(db_client, self.worker.connect())
+        self.assertEqual(3, mock_db_client.call_count)
+
+    @patch("app.daemon.DBClient")
+    def test_connect_gives_up_once_stopping(self, mock_db_client):
+        mock_db_client.side_effect = psycopg2.OperationalError("down")
+        threading.Timer(0.05, self.job_queue.close).start()
+
+        self.assertIsNone(self.worker.connect())
+
+    @patch("app.daemon.DB_RETRY_SECONDS", 0.01)
+    @patch("app.daemon.sync_playwright")
+    @patch("app.daemon.DBClient")
+    def test_worker_keeps_running_when_the_database_goes_away(self, mock_db_client, mock_sync_pw):
+        lost, restored = Mock(), Mock()
+        lost.rollback.side_effect = psycopg2.InterfaceError("connection already closed")
+        lost.reconnect.side_effect = psycopg2.OperationalError("could not connect")
+        mock_db_client.side_effect = [lost, psycopg2.OperationalError("still down"), restored]
+        done = threading.Event()
+        failing = Job(
+            "club", Mock(side_effect=psycopg2.OperationalError("server closed")), Mock(return_value=None), priority=0
+        )
+        succeeding = Job(
+            "metadata", Mock(side_effect=lambda db_client, pool: done.set() or True), Mock(return_value=None)
+        )
+        self.job_queue.schedule(failing, 0)
+        self.job_queue.schedule(succeeding, 0)
+
+        self.worker.start()
+        done.wait(5)
+        self.job_queue.close()
+        self.worker.join(5)
+
+        succeeding.action.assert_called_once_with(restored, self.identity_pool)
+        restored.commit.assert_called_once()
+        restored.close.assert_called_once()
+        self.identity_pool.use_playwright.assert_called_once()
+        self.identity_pool.close.assert_called_once()
+
+    def test_jobs_are_not_rescheduled_after_shutdown(self):
+        self.job_queue.close()
+        job = Job("club", Mock(return_value=True), Mock(return_value=5000))
+        self.worker.run_job(job, self.db_client, Mock())
+
+        self.assertEqual(0, len(self.job_queue))
+
+
+@patch("app.daemon.create_identity_pool")
+@patch("app.daemon.sync_playwright")
+@patch("app.daemon.DBClient")
+class ScraperDaemonTest(unittest.TestCase):
+    def get(self, daemon, path):
+        url = f"http://127.0.0.1:{daemon.server.server_port}{path}"
+        try:
+            with urllib.request.urlopen(url, timeout=5) as response:
+                return response.status, json.loads(response.read())
+        except HTTPError as e:
+            return e.code, json.loads(e.read())
+
+    def test_runs_jobs_and_reports_health_and_metrics(self, mock_db_client, mock_sync_pw, mock_identity_pool):
+        action = Mock(return_value=True)
+        daemon = ScraperDaemon([Job("club", action, lambda success, now: now + 3600)], workers=2, port=0)
+        daemon.start()
+        try:
+            # The job is rescheduled after its metrics are recorded
+            for _ in range(100):
+                if daemon.job_queue.next_run_times():
+                    break
+                daemon.stopping.wait(0.05)
+
+            status, health = self.get(daemon, "/health")
+            self.assertEqual(200, status)
+            self.assertEqual("ok", health["status"])
+            self.assertEqual(2, health["workers_alive"])
+            self.assertIn("club", health["next_runs"])
+
+            status, metrics = self.get(daemon, "/metrics")
+            self.assertEqual(200, status)
+            self.assertEqual(1, metrics["jobs"]["club"]["runs"])
+            self.assertTrue(metrics["jobs"]["club"]["last_success"])
+
+            self.assertEqual(404, self.get(daemon, "/other")[0])
+        finally:
+            daemon.stop()
+            daemon.wait()
+
+        action.assert_called_once()
+        # Both workers share one set of client identities, each closing only its own browser
+        mock_identity_pool.assert_called_once()
+        self.assertEqual(2, mock_identity_pool.return_value.use_playwright.call_count)
+        self.assertEqual(2, mock_identity_pool.return_value.close.call_count)
+        self.assertEqual(2, mock_db_client.return_value.close.call_count)
+
+    def test_health_fails_while_stopping(self, mock_db_client, mock_sync_pw, mock_identity_pool):
+        daemon = ScraperDaemon([], workers=1, port=0)
+        daemon.start()
+        daemon.stop()
+        status, health = daemon.health()
+        daemon.wait()
+
+        self.assertEqual(503, status)
+        self.assertEqual("stopping", health["status"])
+        # Workers waiting for a rested identity are woken rather than held up
+        mock_identity_pool.return_value.stop.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
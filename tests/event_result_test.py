@@ -0,0 +1,61 @@
+import datetime
+import unittest
+from unittest.mock import Mock
+
+from app.models.event_result import EventResult
+from app.utils.club_matcher import ClubMatcher
+from tests.parkrun_result_test import load_file_data
+
+
+class EventResultTest(unittest.TestCase):
+    def test_url_uses_event_and_date(self):
+        event_result = EventResult("pollok", datetime.date(2025, 9, 27), ClubMatcher(["Bellahouston Harriers"]))
+        self.assertEqual("https://www.parkrun.org.uk/pollok/results/2025-09-27/", event_result.url)
+
+    def test_runners_are_fanned_out_per_club(self):
+        matcher = ClubMatcher(["Bellahouston Harriers", "Bellahouston Road Runners", "Shettleston Harriers"])
+        event_result = EventResult("pollok", datetime.date(2025, 9, 27), matcher)
+        event_result.parse_results(load_file_data("event_result_multiple_clubs.html"))
+
+        self.assertEqual(
+            {
+                "Bellahouston Harriers": ["25484", "40197"],
+                "Bellahouston Road Runners": ["51234"],
+                "Shettleston Harriers": ["61001"],
+            },
+            event_result.runner_ids_by_club,
+        )
+
+    def test_untracked_clubs_are_ignored(self):
+        event_result = EventResult("pollok", datetime.date(2025, 9, 27), ClubMatcher(["Shettleston Harriers"]))
+        event_result.parse_results(load_file_data("event_result_multiple_clubs.html"))
+
+        self.assertEqual({"Shettleston Harriers": ["61001"]}, event_result.runner_ids_by_club)
+
+    def test_falls_back_to_row_text_without_club_attribute(self):
+        html = "<table><tr><td>1</td><td><a href='/pollok/parkrunner/123/'>Runner</a></td><td>Custom Club</td></tr></table>"
+        event_result = EventResult("pollok", datetime.date(2025, 9, 27), ClubMatcher(["Custom Club"]))
+        event_result.parse_results(html)
+
+        self.assertEqual({"Custom Club": ["123"]}, event_result.runner_ids_by_club)
+
+    def test_fetch_uses_identity_pool(self):
+        identity_pool = Mock()
+        identity_pool.get_html_content.return_value = (load_file_data("event_result_multiple_clubs.html"), True)
+        event_result = EventResult(
+            "pollok",
+            datetime.date(2025, 9, 27),
+            ClubMatcher(["Bellahouston Harriers"]),
+            identity_pool=identity_pool,
+        )
+        event_result.fetch_results()
+
+        self.assertTrue(event_result.success)
+        self.assertEqual({"Bellahouston Harriers": ["25484", "40197"]}, event_result.runner_ids_by_club)
+        identity_pool.get_html_content.assert_called_with(
+            "https://www.parkrun.org.uk/pollok/results/2025-09-27/", stop_marker="</table>"
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
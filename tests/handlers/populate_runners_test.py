@@ -25,3 +25,30 @@ class PopulateRunnersHandlerTest(unittest.TestCase):
 
         mock_club_scraper.assert_called_with(club_id=1832, club_name="Bellahouston Harriers")
         self.assertEqual(response["statusCode"], 200)
+
+    @patch("app.handlers.populate_runners.EventScraper")
+    def test_lambda_handler_event_mode(self, mock_event_scraper):
+        mock_event_scraper.return_value.scrape_recent_results.return_value = True
+
+        event = {
+            "events": ["pollok", "strathclyde"],
+            "clubs": [
+                {"clubNum": 1832, "clubName": "Bellahouston Harriers"},
+                {"clubNum": 1901, "clubName": "Shettleston Harriers"},
+            ],
+        }
+        response = lambda_handler(event, None)
+
+        mock_event_scraper.assert_called_with(
+            clubs={"Bellahouston Harriers": 1832, "Shettleston Harriers": 1901}, events=["pollok", "strathclyde"]
+        )
+        self.assertEqual(response["statusCode"], 200)
+
+    @patch("app.handlers.populate_runners.EventScraper")
+    def test_lambda_handler_event_mode_defaults_club(self, mock_event_scraper):
+        mock_event_scraper.return_value.scrape_recent_results.return_value = False
+
+        response = lambda_handler({"events": ["pollok"]}, None)
+
+        mock_event_scraper.assert_called_with(clubs={"Bellahouston Harriers": 1832}, events=["pollok"])
+        self.assertEqual(response["statusCode"], 500)
@@ -4,7 +4,8 @@ import os
 from unittest.mock import patch, Mock
 import httpretty
 
-from app.models.parkrun_result import ParkrunResult
+from app.models.parkrun_result import ParkrunResult, results_section
+from app.utils.hash_utils import fingerprint, fingerprint_ids
 from app.utils.http_utils import create_session
 
 
@@ -13,14 +14,19 @@ def load_file_data(filename):
         return f.read()
 
 
-def mock_response(filename="daily_result_no_runners.html"):
-    html_content = load_file_data(filename)
+def mock_html_response(html_content):
     response = Mock()
     response.status_code = 200
-    response.text = html_content
+    response.encoding = "utf-8"
+    response.headers = {}
+    response.iter_content.return_value = [html_content.encode("utf-8")]
     return response
 
 
+def mock_response(filename="daily_result_no_runners.html"):
+    return mock_html_response(load_file_data(filename))
+
+
 def create_mock_context(cookies=()):
     context = Mock()
     context.cookies.return_value = cookies
@@ -33,14 +39,14 @@ class ParkrunResultTest(unittest.TestCase):
         self.session = create_session()
 
     def test_parkrun_result_has_date(self):
-        parkrun_result = ParkrunResult(self.session, None, create_mock_context(), datetime.date(2025, 9, 27))
+        parkrun_result = ParkrunResult(datetime.date(2025, 9, 27), session=self.session, context=create_mock_context())
         self.assertEqual(datetime.date(2025, 9, 27), parkrun_result.date)
 
     @patch("requests.Session.get")
     def test_parkrun_result_no_runners(self, mock_get):
         mock_get.return_value = mock_response("daily_result_no_runners.html")
 
-        parkrun_result = ParkrunResult(self.session, None, create_mock_context(), datetime.date(2025, 9, 26))
+        parkrun_result = ParkrunResult(datetime.date(2025, 9, 26), session=self.session, context=create_mock_context())
         parkrun_result.fetch_results()
 
         self.assertEqual([], parkrun_result.runner_ids)
@@ -48,11 +54,11 @@ class ParkrunResultTest(unittest.TestCase):
     @patch("requests.Session.get")
     def test_parkrun_result_makes_get_request(self, mock_get):
         mock_get.return_value = mock_response()
-        parkrun_result = ParkrunResult(self.session, None, create_mock_context(), datetime.date(2025, 9, 27))
+        parkrun_result = ParkrunResult(datetime.date(2025, 9, 27), session=self.session, context=create_mock_context())
         parkrun_result.fetch_results()
 
         mock_get.assert_called_with(
-            "https://www.parkrun.com/results/consolidatedclub/?clubNum=1832&eventdate=2025-09-27"
+            "https://www.parkrun.com/results/consolidatedclub/?clubNum=1832&eventdate=2025-09-27", stream=True
         )
         self.assertTrue(parkrun_result.success)
 
@@ -60,12 +66,12 @@ class ParkrunResultTest(unittest.TestCase):
     def test_parkrun_result_custom_club_id(self, mock_get):
         mock_get.return_value = mock_response()
         parkrun_result = ParkrunResult(
-            self.session, None, create_mock_context(), datetime.date(2025, 9, 27), club_id=999
+            datetime.date(2025, 9, 27), club_id=999, session=self.session, context=create_mock_context()
         )
         parkrun_result.fetch_results()
 
         mock_get.assert_called_with(
-            "https://www.parkrun.com/results/consolidatedclub/?clubNum=999&eventdate=2025-09-27"
+            "https://www.parkrun.com/results/consolidatedclub/?clubNum=999&eventdate=2025-09-27", stream=True
         )
         self.assertTrue(parkrun_result.success)
 
@@ -73,10 +79,10 @@ class ParkrunResultTest(unittest.TestCase):
     def test_parkrun_result_custom_club_name(self, mock_get):
         # HTML with a custom club
         html = "<html><body><table><tr><td>1</td><td>1</td><td><a href='/parkrunner/123'>Runner</a></td><td>Custom Club</td><td>00:20:00</td></tr></table></body></html>"
-        mock_get.return_value = Mock(status_code=200, text=html)
+        mock_get.return_value = mock_html_response(html)
 
         parkrun_result = ParkrunResult(
-            self.session, None, create_mock_context(), datetime.date(2025, 9, 27), club_name="Custom Club"
+            datetime.date(2025, 9, 27), club_name="Custom Club", session=self.session, context=create_mock_context()
         )
         parkrun_result.fetch_results()
 
@@ -85,7 +91,7 @@ class ParkrunResultTest(unittest.TestCase):
     @patch("requests.Session.get")
     def test_parkrun_result_single_parkrun_single_runner(self, mock_get):
         mock_get.return_value = mock_response("daily_result_one_parkrun_one_runner.html")
-        parkrun_result = ParkrunResult(self.session, None, create_mock_context(), datetime.date(2025, 9, 27))
+        parkrun_result = ParkrunResult(datetime.date(2025, 9, 27), session=self.session, context=create_mock_context())
         parkrun_result.fetch_results()
 
         self.assertEqual(["2243726"], parkrun_result.runner_ids)
@@ -93,7 +99,7 @@ class ParkrunResultTest(unittest.TestCase):
     @patch("requests.Session.get")
     def test_parkrun_result_single_parkrun_multiple_runners(self, mock_get):
         mock_get.return_value = mock_response("daily_result_one_parkrun_multiple_runners.html")
-        parkrun_result = ParkrunResult(self.session, None, create_mock_context(), datetime.date(2025, 9, 27))
+        parkrun_result = ParkrunResult(datetime.date(2025, 9, 27), session=self.session, context=create_mock_context())
         parkrun_result.fetch_results()
 
         self.assertEqual(["23575", "22507"], parkrun_result.runner_ids)
@@ -101,13 +107,53 @@ class ParkrunResultTest(unittest.TestCase):
     @patch("requests.Session.get")
     def test_parkrun_result_multiple_parkruns_multiple_runners(self, mock_get):
         mock_get.return_value = mock_response("daily_result_multiple_parkruns_multiple_runners.html")
-        parkrun_result = ParkrunResult(self.session, None, create_mock_context(), datetime.date(2025, 9, 27))
+        parkrun_result = ParkrunResult(datetime.date(2025, 9, 27), session=self.session, context=create_mock_context())
         parkrun_result.fetch_results()
 
         self.assertEqual(
             ["27348", "28837", "25484", "40197", "31202", "34610", "30600", "26919"], parkrun_result.runner_ids
         )
 
+    @patch("requests.Session.get")
+    def test_parkrun_result_records_fingerprints(self, mock_get):
+        mock_get.return_value = mock_response("daily_result_one_parkrun_one_runner.html")
+        parkrun_result = ParkrunResult(datetime.date(2025, 9, 27), session=self.session, context=create_mock_context())
+        parkrun_result.fetch_results()
+
+        self.assertTrue(parkrun_result.changed)
+        self.assertEqual(
+            fingerprint(results_section(load_file_data("daily_result_one_parkrun_one_runner.html"))),
+            parkrun_result.page_fingerprint,
+        )
+        self.assertEqual(fingerprint_ids(["2243726"]), parkrun_result.result_fingerprint)
+
+    @patch("requests.Session.get")
+    def test_parkrun_result_skips_parse_for_unchanged_page(self, mock_get):
+        mock_get.return_value = mock_response("daily_result_one_parkrun_one_runner.html")
+        previous_fingerprint = fingerprint(results_section(load_file_data("daily_result_one_parkrun_one_runner.html")))
+        parkrun_result = ParkrunResult(datetime.date(2025, 9, 27), session=self.session, context=create_mock_context())
+        with patch.object(parkrun_result, "parse_results") as mock_parse:
+            parkrun_result.fetch_results(previous_fingerprint)
+
+        mock_parse.assert_not_called()
+        self.assertTrue(parkrun_result.success)
+        self.assertFalse(parkrun_result.changed)
+        self.assertEqual([], parkrun_result.runner_ids)
+
+    def test_parkrun_result_ignores_page_generation_time(self):
+        # The browser fallback returns the whole page, including the generation time after the footer
+        html = load_file_data("daily_result_one_parkrun_one_runner.html")
+        regenerated = html.replace("Dynamic page generated in 0.807 seconds", "Dynamic page generated in 1.203 seconds")
+        self.assertNotEqual(html, regenerated)
+        first = ParkrunResult(datetime.date(2025, 9, 27))
+        first.process_page(html)
+
+        second = ParkrunResult(datetime.date(2025, 9, 27))
+        second.process_page(regenerated, first.page_fingerprint)
+
+        self.assertFalse(second.changed)
+        self.assertEqual([], second.runner_ids)
+
     @patch("requests.Session.get")
     def test_parkrun_result_bot_protection_uses_playwright(self, mock_get):
         self.session.cookies.set = Mock()
@@ -115,12 +161,12 @@ class ParkrunResultTest(unittest.TestCase):
         mock_page = Mock()
         mock_page.content.return_value = load_file_data("daily_result_one_parkrun_one_runner.html")
         parkrun_result = ParkrunResult(
-            self.session,
-            mock_page,
-            create_mock_context(
+            datetime.date(2025, 9, 27),
+            session=self.session,
+            page=mock_page,
+            context=create_mock_context(
                 [{"name": "cookie1", "value": "cookie1value"}, {"name": "cookie2", "value": "cookie2value"}]
             ),
-            datetime.date(2025, 9, 27),
         )
         parkrun_result.fetch_results()
 
@@ -148,7 +194,7 @@ class ParkrunResultTest(unittest.TestCase):
             ],
         )
         parkrun_result = ParkrunResult(
-            create_session(backoff_factor=0), None, create_mock_context(), datetime.date(2025, 9, 27)
+            datetime.date(2025, 9, 27), session=create_session(backoff_factor=0), context=create_mock_context()
         )
         parkrun_result.fetch_results()
 
@@ -169,7 +215,9 @@ class ParkrunResultTest(unittest.TestCase):
             ],
         )
         parkrun_result = ParkrunResult(
-            create_session(max_retries=4, backoff_factor=0), None, create_mock_context(), datetime.date(2025, 9, 27)
+            datetime.date(2025, 9, 27),
+            session=create_session(max_retries=4, backoff_factor=0),
+            context=create_mock_context(),
         )
         parkrun_result.fetch_results()
 
@@ -1,5 +1,5 @@
 import unittest
-from unittest.mock import patch, Mock
+from unittest.mock import patch
 import datetime
 from freezegun import freeze_time
 from app.scrapers.club_scraper import ClubScraper
@@ -10,18 +10,16 @@ class ClubScraperTest(unittest.TestCase):
         self.scraper = ClubScraper()
 
     @freeze_time("2025-10-20")
-    @patch("app.scrapers.club_scraper.DBClient")
-    @patch("app.scrapers.club_scraper.sync_playwright")
+    @patch("app.utils.scrape_utils.DBClient")
+    @patch("app.utils.scrape_utils.sync_playwright")
     @patch("app.scrapers.club_scraper.ParkrunResult")
-    @patch("app.scrapers.club_scraper.init_playwright")
-    @patch("app.scrapers.club_scraper.create_session")
-    def test_scrape_recent_results(self, mock_session, mock_init_pw, mock_result, mock_sync_pw, mock_db_client):
+    @patch("app.utils.scrape_utils.create_identity_pool")
+    def test_scrape_recent_results(self, mock_identity_pool, mock_result, mock_sync_pw, mock_db_client):
         # Setup mocks
         db_instance = mock_db_client.return_value.__enter__.return_value
         # last scrape was 2025-10-15. 15th - 15 days = Oct 1. Oct 1 to Oct 20.
         db_instance.get_last_club_athlete_scrape_time.return_value = datetime.datetime(2025, 10, 15)
-
-        mock_init_pw.return_value = (Mock(), Mock(), Mock())
+        db_instance.get_page_fingerprints.return_value = {}
 
         result_instance = mock_result.return_value
         result_instance.success = True
@@ -36,7 +34,127 @@ class ClubScraperTest(unittest.TestCase):
         self.assertTrue(success)
         # Check if insert_new_parkrunners was called with a set containing "1" and "2"
         db_instance.insert_new_parkrunners.assert_called()
-        db_instance.add_last_scrape_metadata.assert_called_with(2, True)
+        db_instance.add_last_scrape_metadata.assert_called_with(2, True, 21, 21)
+        mock_result.assert_called_with(
+            datetime.date(2025, 10, 20),
+            1832,
+            "Bellahouston Harriers",
+            identity_pool=mock_identity_pool.return_value,
+        )
+        mock_identity_pool.return_value.close.assert_called_once()
+
+    @freeze_time("2025-10-20")
+    @patch("app.utils.scrape_utils.DBClient")
+    @patch("app.utils.scrape_utils.sync_playwright")
+    @patch("app.scrapers.club_scraper.ParkrunResult")
+    @patch("app.utils.scrape_utils.create_identity_pool")
+    def test_scrape_recent_results_skips_unchanged_pages(
+        self, mock_identity_pool, mock_result, mock_sync_pw, mock_db_client
+    ):
+        db_instance = mock_db_client.return_value.__enter__.return_value
+        db_instance.get_last_club_athlete_scrape_time.return_value = datetime.datetime(2025, 10, 15)
+        db_instance.get_page_fingerprints.return_value = {
+            datetime.date(2025, 9, 30): ("page", "result"),
+        }
+
+        result_instance = mock_result.return_value
+        result_instance.success = True
+        result_instance.changed = False
+        result_instance.runner_ids = ["1", "2"]
+
+        success = self.scraper.scrape_recent_results()
+
+        self.assertTrue(success)
+        html = result_instance.fetch_page.return_value
+        result_instance.process_page.assert_any_call(html, "page")
+        result_instance.process_page.assert_called_with(html, None)
+        db_instance.insert_new_parkrunners.assert_not_called()
+        db_instance.save_page_fingerprints.assert_not_called()
+        db_instance.add_last_scrape_metadata.assert_called_with(0, True, 21, 0)
+
+    @freeze_time("2025-10-04")
+    @patch("app.utils.scrape_utils.DBClient")
+    @patch("app.utils.scrape_utils.sync_playwright")
+    @patch("app.scrapers.club_scraper.ParkrunResult")
+    @patch("app.utils.scrape_utils.create_identity_pool")
+    def test_scrape_recent_results_skips_insert_when_runners_unchanged(
+        self, mock_identity_pool, mock_result, mock_sync_pw, mock_db_client
+    ):
+        db_instance = mock_db_client.return_value.__enter__.return_value
+        db_instance.get_last_club_athlete_scrape_time.return_value = datetime.datetime(2025, 10, 19, 12)
+        db_instance.get_page_fingerprints.return_value = {
+            datetime.date(2025, 10, 4): ("old page", "result"),
+        }
+
+        result_instance = mock_result.return_value
+        result_instance.success = True
+        result_instance.changed = True
+        result_instance.date = datetime.date(2025, 10, 4)
+        result_instance.page_fingerprint = "new page"
+        result_instance.result_fingerprint = "result"
+        result_instance.runner_ids = ["1", "2"]
+
+        success = self.scraper.scrape_recent_results()
+
+        self.assertTrue(success)
+        db_instance.insert_new_parkrunners.assert_not_called()
+        db_instance.save_page_fingerprints.assert_called_with(
+            1832, [(datetime.date(2025, 10, 4), "new page", "result")]
+        )
+        db_instance.add_last_scrape_metadata.assert_called_with(0, True, 1, 1)
+
+    @freeze_time("2025-10-20")
+    @patch("app.utils.scrape_utils.DBClient")
+    @patch("app.utils.scrape_utils.sync_playwright")
+    @patch("app.scrapers.club_scraper.ParkrunResult")
+    @patch("app.utils.scrape_utils.create_identity_pool")
+    def test_scrape_recent_results_commits_in_batches(
+        self, mock_identity_pool, mock_result, mock_sync_pw, mock_db_client
+    ):
+        db_instance = mock_db_client.return_value.__enter__.return_value
+        db_instance.get_last_club_athlete_scrape_time.return_value = datetime.datetime(2025, 10, 15)
+        db_instance.get_page_fingerprints.return_value = {}
+
+        result_instance = mock_result.return_value
+        result_instance.success = True
+        result_instance.changed = True
+        result_instance.runner_ids = ["1", "2"]
+        db_instance.insert_new_parkrunners.return_value = ["1", "2"]
+
+        success = ClubScraper(write_batch_size=5).scrape_recent_results()
+
+        self.assertTrue(success)
+        # 21 pages in batches of 5, and each runner is only submitted once
+        self.assertEqual(5, db_instance.save_page_fingerprints.call_count)
+        self.assertEqual(5, db_instance.commit.call_count)
+        db_instance.insert_new_parkrunners.assert_called_once_with({"1", "2"})
+        db_instance.add_last_scrape_metadata.assert_called_with(2, True, 21, 21)
+
+    @freeze_time("2025-10-20")
+    @patch("app.utils.scrape_utils.DBClient")
+    @patch("app.utils.scrape_utils.sync_playwright")
+    @patch("app.scrapers.club_scraper.ParkrunResult")
+    @patch("app.utils.scrape_utils.create_identity_pool")
+    def test_scrape_recent_results_keeps_written_batches_when_parsing_fails(
+        self, mock_identity_pool, mock_result, mock_sync_pw, mock_db_client
+    ):
+        db_instance = mock_db_client.return_value.__enter__.return_value
+        db_instance.get_last_club_athlete_scrape_time.return_value = datetime.datetime(2025, 10, 15)
+        db_instance.get_page_fingerprints.return_value = {}
+
+        result_instance = mock_result.return_value
+        result_instance.success = True
+        result_instance.changed = True
+        result_instance.runner_ids = ["1"]
+        result_instance.process_page.side_effect = [None, None, None, ValueError("Bad page")]
+
+        with self.assertRaises(RuntimeError):
+            ClubScraper(write_batch_size=2).scrape_recent_results()
+
+        # The first batch was committed, and the page parsed before the failure was flushed on close
+        self.assertEqual(2, db_instance.commit.call_count)
+        db_instance.insert_new_parkrunners.assert_called_once_with({"1"})
+        db_instance.add_last_scrape_metadata.assert_not_called()
 
 
 if __name__ == "__main__":
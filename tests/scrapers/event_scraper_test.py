@@ -0,0 +1,100 @@
+import unittest
+from unittest.mock import patch
+import datetime
+from freezegun import freeze_time
+from app.scrapers.event_scraper import EventScraper
+from app.utils.date_utils import parkrun_days
+from tests.parkrun_result_test import load_file_data
+
+
+class EventScraperTest(unittest.TestCase):
+    def test_parkrun_days_are_saturdays_and_special_days(self):
+        days = list(parkrun_days(datetime.date(2025, 12, 20), datetime.date(2026, 1, 3)))
+        self.assertEqual(
+            [
+                datetime.date(2025, 12, 20),
+                datetime.date(2025, 12, 25),
+                datetime.date(2025, 12, 27),
+                datetime.date(2026, 1, 1),
+                datetime.date(2026, 1, 3),
+            ],
+            days,
+        )
+
+    @freeze_time("2025-10-20")
+    @patch("app.utils.scrape_utils.DBClient")
+    @patch("app.utils.scrape_utils.sync_playwright")
+    @patch("app.utils.scrape_utils.create_identity_pool")
+    def test_scrape_recent_results(self, mock_identity_pool, mock_sync_pw, mock_db_client):
+        db_instance = mock_db_client.return_value.__enter__.return_value
+        # Sep 30 to Oct 20 has three Saturdays
+        db_instance.get_last_club_athlete_scrape_time.return_value = datetime.datetime(2025, 10, 15)
+        db_instance.insert_new_parkrunners.return_value = ["25484", "40197", "61001"]
+        db_instance.get_club_events.return_value = []
+        identity_pool = mock_identity_pool.return_value
+        identity_pool.get_html_content.return_value = (load_file_data("event_result_multiple_clubs.html"), True)
+
+        scraper = EventScraper(
+            clubs={"Bellahouston Harriers": 1832, "Shettleston Harriers": 1901}, events=["pollok", "strathclyde"]
+        )
+        success = scraper.scrape_recent_results()
+
+        self.assertTrue(success)
+        # One request per event and date, however many clubs are tracked
+        self.assertEqual(6, identity_pool.get_html_content.call_count)
+        identity_pool.get_html_content.assert_any_call(
+            "https://www.parkrun.org.uk/strathclyde/results/2025-10-04/", stop_marker="</table>"
+        )
+        db_instance.insert_new_parkrunners.assert_called_once_with({"25484", "40197", "61001"})
+        db_instance.insert_club_runners.assert_any_call(1832, ["25484", "40197"])
+        db_instance.insert_club_runners.assert_any_call(1901, ["61001"])
+        self.assertEqual(3, db_instance.commit.call_count)
+        db_instance.add_last_scrape_metadata.assert_called_with(3, True, 6, None)
+        identity_pool.close.assert_called_once()
+
+    @freeze_time("2025-10-20")
+    @patch("app.utils.scrape_utils.DBClient")
+    @patch("app.utils.scrape_utils.sync_playwright")
+    @patch("app.utils.scrape_utils.create_identity_pool")
+    def test_scrape_recent_results_stops_on_failed_fetch(self, mock_identity_pool, mock_sync_pw, mock_db_client):
+        db_instance = mock_db_client.return_value.__enter__.return_value
+        db_instance.get_last_club_athlete_scrape_time.return_value = datetime.datetime(2025, 10, 15)
+        db_instance.insert_new_parkrunners.return_value = ["25484", "40197"]
+        db_instance.get_club_events.return_value = []
+        identity_pool = mock_identity_pool.return_value
+        html = load_file_data("event_result_multiple_clubs.html")
+        identity_pool.get_html_content.side_effect = [(html, True), (html, True), (html, True), (None, False)]
+
+        scraper = EventScraper(clubs={"Bellahouston Harriers": 1832}, events=["pollok", "strathclyde"])
+        success = scraper.scrape_recent_results()
+
+        self.assertFalse(success)
+        # The first date is written, the second date is incomplete so nothing from it is recorded
+        self.assertEqual(1, db_instance.commit.call_count)
+        db_instance.insert_club_runners.assert_called_once_with(1832, ["25484", "40197"])
+        db_instance.add_last_scrape_metadata.assert_called_with(2, False, 3, None)
+
+    @freeze_time("2025-10-20")
+    @patch("app.utils.scrape_utils.DBClient")
+    @patch("app.utils.scrape_utils.sync_playwright")
+    @patch("app.utils.scrape_utils.create_identity_pool")
+    def test_events_are_derived_from_runner_histories(self, mock_identity_pool, mock_sync_pw, mock_db_client):
+        db_instance = mock_db_client.return_value.__enter__.return_value
+        db_instance.get_last_club_athlete_scrape_time.return_value = datetime.datetime(2025, 10, 15)
+        db_instance.get_club_events.return_value = ["pollok", "victoria"]
+        identity_pool = mock_identity_pool.return_value
+        identity_pool.get_html_content.return_value = (load_file_data("event_result_multiple_clubs.html"), True)
+
+        EventScraper(clubs={"Bellahouston Harriers": 1832}, events=["pollok", "strathclyde"]).scrape_recent_results()
+
+        # 90 days before the start of the scrape window
+        db_instance.get_club_events.assert_called_once_with([1832], datetime.date(2025, 7, 2))
+        # The listed and derived events, each fetched once, for each of the three Saturdays
+        self.assertEqual(9, identity_pool.get_html_content.call_count)
+        identity_pool.get_html_content.assert_any_call(
+            "https://www.parkrun.org.uk/victoria/results/2025-10-18/", stop_marker="</table>"
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
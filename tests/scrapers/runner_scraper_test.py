@@ -1,6 +1,11 @@
+import datetime
 import unittest
-from unittest.mock import patch, Mock
-from app.scrapers.runner_scraper import RunnerScraper
+from unittest.mock import Mock, patch
+from app.models.runner_history import EventSummary, RecentRun
+from app.scrapers.runner_scraper import RunnerScraper, next_history_refresh
+from tests.parkrun_result_test import load_file_data
+
+NOW = datetime.datetime(2024, 10, 14, 9, 0, tzinfo=datetime.timezone.utc)
 
 
 class RunnerScraperTest(unittest.TestCase):
@@ -19,26 +24,106 @@ class RunnerScraperTest(unittest.TestCase):
         metadata = self.scraper.parse_runner_metadata(html)
         self.assertEqual("Jane Smith", metadata["name"])
 
-    @patch("app.scrapers.runner_scraper.DBClient")
-    @patch("app.scrapers.runner_scraper.sync_playwright")
-    @patch("app.scrapers.runner_scraper.get_html_content")
-    @patch("app.scrapers.runner_scraper.create_session")
-    @patch("app.scrapers.runner_scraper.init_playwright")
-    def test_scrape_missing_metadata(
-        self, mock_init_pw, mock_create_session, mock_get_html, mock_sync_pw, mock_db_client
-    ):
+    def test_parse_runner_metadata_without_history(self):
+        metadata = self.scraper.parse_runner_metadata("<html><body><h2>John DOE (123456)</h2></body></html>")
+        self.assertIsNone(metadata["club_id"])
+        self.assertEqual([], metadata["recent_runs"])
+        self.assertEqual([], metadata["event_summaries"])
+
+    def test_parse_runner_metadata_from_profile_page(self):
+        metadata = self.scraper.parse_runner_metadata(load_file_data("runner_profile.html"))
+
+        self.assertEqual("John Doe", metadata["name"])
+        self.assertEqual(1832, metadata["club_id"])
+        self.assertEqual("Bellahouston Harriers", metadata["club_name"])
+        self.assertEqual(
+            [
+                RecentRun("pollok", datetime.date(2024, 10, 12), 612, 45, 1263, 62.43, True),
+                RecentRun("strathclyde", datetime.date(2024, 10, 5), 540, 102, 1361, 57.97, False),
+                RecentRun("pollok", datetime.date(2024, 9, 28), 610, 230, 3735, 21.12, False),
+            ],
+            metadata["recent_runs"],
+        )
+        self.assertEqual(
+            [EventSummary("pollok", 98, 15, 1263), EventSummary("strathclyde", 6, 88, 1330)],
+            metadata["event_summaries"],
+        )
+
+    def test_active_runners_are_refreshed_sooner(self):
+        def refresh_after(last_run):
+            runs = [RecentRun("pollok", last_run, None, None, None, None, False)]
+            return next_history_refresh(runs, NOW) - NOW
+
+        self.assertEqual(datetime.timedelta(days=7), refresh_after(datetime.date(2024, 10, 12)))
+        self.assertEqual(datetime.timedelta(days=30), refresh_after(datetime.date(2024, 3, 2)))
+        self.assertEqual(datetime.timedelta(days=180), refresh_after(datetime.date(2022, 3, 5)))
+        self.assertEqual(datetime.timedelta(days=180), next_history_refresh([], NOW) - NOW)
+
+    @patch("app.utils.scrape_utils.DBClient")
+    @patch("app.utils.scrape_utils.sync_playwright")
+    @patch("app.utils.scrape_utils.create_identity_pool")
+    def test_scrape_missing_metadata(self, mock_identity_pool, mock_sync_pw, mock_db_client):
         # Setup mocks
         db_instance = mock_db_client.return_value.__enter__.return_value
-        db_instance.get_runners_missing_metadata.return_value = ["123"]
+        db_instance.get_runners_due_for_refresh.return_value = ["123"]
 
-        mock_init_pw.return_value = (Mock(), Mock(), Mock())
-        mock_get_html.return_value = ("<html><body><h2>John DOE (123)</h2></body></html>", True)
+        identity_pool = mock_identity_pool.return_value
+        identity_pool.get_html_content.return_value = ("<html><body><h2>John DOE (123)</h2></body></html>", True)
 
         # Run
         self.scraper.scrape_missing_metadata(limit=1)
 
         # Verify
-        db_instance.update_runner_metadata.assert_called_with("123", "John Doe")
+        ((runner_id, metadata, refresh_after),) = db_instance.save_runner_profiles.call_args.args[0]
+        self.assertEqual("123", runner_id)
+        self.assertEqual("John Doe", metadata["name"])
+        self.assertIsNotNone(refresh_after)
+        db_instance.commit.assert_called_once()
+        identity_pool.get_html_content.assert_called_with(
+            "https://www.parkrun.org.uk/parkrunner/123/", stop_marker="<footer"
+        )
+        identity_pool.close.assert_called_once()
+
+    @patch("app.utils.scrape_utils.DBClient")
+    def test_profiles_are_saved_in_batches(self, mock_db_client):
+        db_instance = mock_db_client.return_value.__enter__.return_value
+        db_instance.get_runners_due_for_refresh.return_value = ["1", "2", "3", "4", "5"]
+        identity_pool = Mock()
+        identity_pool.get_html_content.side_effect = [
+            (load_file_data("runner_profile.html"), True),
+            (load_file_data("runner_profile.html"), True),
+            ("", False),
+            (load_file_data("runner_profile.html"), True),
+            (load_file_data("runner_profile.html"), True),
+        ]
+
+        RunnerScraper(write_batch_size=2).scrape_missing_metadata(limit=5, identity_pool=identity_pool)
+
+        batches = [[profile[0] for profile in call.args[0]] for call in db_instance.save_runner_profiles.call_args_list]
+        # The failed fetch is deferred in the second batch
+        self.assertEqual([["1", "2"], ["4"], ["5"]], batches)
+        self.assertEqual(["3"], db_instance.defer_runner_refresh.call_args.args[0])
+        self.assertEqual(3, db_instance.commit.call_count)
+
+    @patch("app.utils.scrape_utils.DBClient")
+    def test_failed_and_unnamed_profiles_are_deferred(self, mock_db_client):
+        db_instance = mock_db_client.return_value.__enter__.return_value
+        db_instance.get_runners_due_for_refresh.return_value = ["1", "2", "3"]
+        identity_pool = Mock()
+        identity_pool.get_html_content.side_effect = [
+            ("", False),
+            ("<html><body></body></html>", True),
+            (load_file_data("runner_profile.html"), True),
+        ]
+        scraper = RunnerScraper()
+
+        scraper.scrape_missing_metadata(limit=3, identity_pool=identity_pool)
+
+        runner_ids, now, backoff, max_backoff = db_instance.defer_runner_refresh.call_args.args
+        self.assertEqual(["1", "2"], runner_ids)
+        self.assertEqual(datetime.timedelta(hours=1), backoff)
+        # Only the saved profile counts, so the daemon doesn't treat failing runners as a backlog
+        self.assertEqual(1, scraper.runner_count)
 
 
 if __name__ == "__main__":
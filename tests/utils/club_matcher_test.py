@@ -0,0 +1,27 @@
+import unittest
+
+from app.utils.club_matcher import ClubMatcher
+
+
+class ClubMatcherTest(unittest.TestCase):
+    def test_matches_any_tracked_club(self):
+        matcher = ClubMatcher(["Bellahouston Harriers", "Shettleston Harriers"])
+        self.assertEqual("Bellahouston Harriers", matcher.match("Bellahouston Harriers "))
+        self.assertEqual("Shettleston Harriers", matcher.match("35 1 Someone Shettleston Harriers 00:19:53"))
+        self.assertIsNone(matcher.match("Unattached"))
+
+    def test_prefers_longest_club_name(self):
+        matcher = ClubMatcher(["Bellahouston Harriers", "Bellahouston Harriers Juniors"])
+        self.assertEqual("Bellahouston Harriers Juniors", matcher.match("Bellahouston Harriers Juniors"))
+
+    def test_club_names_are_matched_literally(self):
+        matcher = ClubMatcher(["St. Andrews (AC)"])
+        self.assertEqual("St. Andrews (AC)", matcher.match("St. Andrews (AC)"))
+        self.assertIsNone(matcher.match("StX Andrews AC"))
+
+    def test_no_clubs_matches_nothing(self):
+        self.assertIsNone(ClubMatcher([]).match("Bellahouston Harriers"))
+
+
+if __name__ == "__main__":
+    unittest.main()
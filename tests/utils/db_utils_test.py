@@ -1,6 +1,8 @@
 import os
 import unittest
-from unittest.mock import patch, Mock, MagicMock
+from datetime import date, timedelta
+from unittest.mock import patch, Mock, MagicMock, call
+from app.models.runner_history import EventSummary, RecentRun
 from app.utils.db_utils import DBClient
 from dateutil import parser
 from freezegun import freeze_time
@@ -74,34 +76,168 @@ class DBClientTest(unittest.TestCase):
         self.assertEqual(["12345", "67890"], new_parkrunners)
         mock_cursor.__exit__.assert_called_once()
 
+    def test_insert_club_runners(self, mock_connect):
+        mock_cursor = create_mock_cursor()
+        mock_connect.return_value.cursor.return_value = mock_cursor
+        with DBClient() as db_client:
+            db_client.insert_club_runners(1832, ["12345", "67890"])
+        mock_cursor.execute.assert_called_with(
+            "INSERT INTO public.club_runners(club_id, runner_id) VALUES (%s, %s), (%s, %s) ON CONFLICT(club_id, runner_id) DO NOTHING;",
+            [1832, "12345", 1832, "67890"],
+        )
+
+    def test_get_club_events(self, mock_connect):
+        mock_cursor = create_mock_cursor()
+        mock_connect.return_value.cursor.return_value = mock_cursor
+        mock_cursor.fetchall.return_value = [["pollok"], ["strathclyde"]]
+        with DBClient() as db_client:
+            events = db_client.get_club_events([1832, 1901], date(2025, 7, 1))
+        mock_cursor.execute.assert_called_with(
+            "SELECT DISTINCT rr.event FROM public.runner_results rr JOIN public.runners r ON r.id = rr.runner_id "
+            "WHERE r.club_id = ANY(%s) AND rr.event_date >= %s ORDER BY rr.event;",
+            ([1832, 1901], date(2025, 7, 1)),
+        )
+        self.assertEqual(["pollok", "strathclyde"], events)
+
+    def test_get_club_events_with_no_clubs(self, mock_connect):
+        mock_cursor = create_mock_cursor()
+        mock_connect.return_value.cursor.return_value = mock_cursor
+        mock_cursor.fetchall.return_value = []
+        with DBClient() as db_client:
+            events = db_client.get_club_events([], date(2025, 7, 1))
+        # An empty array rather than an empty IN (), which isn't valid SQL
+        self.assertEqual(([], date(2025, 7, 1)), mock_cursor.execute.call_args[0][1])
+        self.assertEqual([], events)
+
     @freeze_time("2025-10-01T23:27:00+01:00")
     def test_add_last_scrape_metadata(self, mock_connect):
         mock_cursor = create_mock_cursor()
         mock_connect.return_value.cursor.return_value = mock_cursor
         with DBClient() as db_client:
-            db_client.add_last_scrape_metadata(10, True)
+            db_client.add_last_scrape_metadata(10, True, 16, 3)
         mock_cursor.execute.assert_called_with(
-            "INSERT INTO public.last_scrape_metadata (last_scrape_time, new_parkrunners_count, success) VALUES (%s, %s, %s);",
-            (parser.isoparse("2025-10-01T23:27:00+01:00"), 10, True),
+            "INSERT INTO public.last_scrape_metadata (last_scrape_time, new_parkrunners_count, success, pages_fetched, pages_changed) VALUES (%s, %s, %s, %s, %s);",
+            (parser.isoparse("2025-10-01T23:27:00+01:00"), 10, True, 16, 3),
         )
         mock_cursor.__exit__.assert_called_once()
 
-    def test_get_runners_missing_metadata(self, mock_connect):
+    def test_get_page_fingerprints(self, mock_connect):
+        mock_cursor = create_mock_cursor()
+        mock_connect.return_value.cursor.return_value = mock_cursor
+        mock_cursor.fetchall.return_value = [
+            [date(2025, 9, 27), "page1", "result1"],
+            [date(2025, 9, 28), "page2", None],
+        ]
+        with DBClient() as db_client:
+            fingerprints = db_client.get_page_fingerprints(1832, date(2025, 9, 20), date(2025, 9, 30))
+        mock_cursor.execute.assert_called_with(
+            "SELECT event_date, page_fingerprint, result_fingerprint FROM public.page_fingerprints WHERE club_id = %s AND event_date BETWEEN %s AND %s;",
+            (1832, date(2025, 9, 20), date(2025, 9, 30)),
+        )
+        self.assertEqual({date(2025, 9, 27): ("page1", "result1"), date(2025, 9, 28): ("page2", None)}, fingerprints)
+
+    @freeze_time("2025-10-01T23:27:00+01:00")
+    def test_save_page_fingerprints(self, mock_connect):
+        mock_cursor = create_mock_cursor()
+        mock_connect.return_value.cursor.return_value = mock_cursor
+        with DBClient() as db_client:
+            db_client.save_page_fingerprints(
+                1832, [(date(2025, 9, 27), "page1", "result1"), (date(2025, 9, 28), "page2", "result2")]
+            )
+        now = parser.isoparse("2025-10-01T23:27:00+01:00")
+        mock_cursor.execute.assert_called_with(
+            "INSERT INTO public.page_fingerprints (club_id, event_date, page_fingerprint, result_fingerprint, updated_at) VALUES (%s, %s, %s, %s, %s), (%s, %s, %s, %s, %s) "
+            "ON CONFLICT(club_id, event_date) DO UPDATE SET page_fingerprint = EXCLUDED.page_fingerprint, "
+            "result_fingerprint = EXCLUDED.result_fingerprint, updated_at = EXCLUDED.updated_at;",
+            [1832, date(2025, 9, 27), "page1", "result1", now, 1832, date(2025, 9, 28), "page2", "result2", now],
+        )
+
+    def test_get_runners_due_for_refresh(self, mock_connect):
         mock_cursor = create_mock_cursor()
         mock_connect.return_value.cursor.return_value = mock_cursor
         mock_cursor.fetchall.return_value = [["12345"], ["67890"]]
+        now = parser.isoparse("2025-10-01T23:27:00+01:00")
         with DBClient() as db_client:
-            runners = db_client.get_runners_missing_metadata(limit=10)
-        mock_cursor.execute.assert_called_with("SELECT id FROM public.runners WHERE name IS NULL LIMIT %s;", (10,))
+            runners = db_client.get_runners_due_for_refresh(now, limit=10)
+        mock_cursor.execute.assert_called_with(
+            "SELECT id FROM public.runners WHERE history_refresh_after IS NULL OR history_refresh_after <= %s "
+            "ORDER BY history_refresh_after NULLS FIRST LIMIT %s;",
+            (now, 10),
+        )
         self.assertEqual(["12345", "67890"], runners)
 
-    def test_update_runner_metadata(self, mock_connect):
+    @freeze_time("2025-10-01T23:27:00+01:00")
+    def test_save_runner_profiles(self, mock_connect):
+        mock_cursor = create_mock_cursor()
+        mock_connect.return_value.cursor.return_value = mock_cursor
+        now = parser.isoparse("2025-10-01T23:27:00+01:00")
+        refresh_after = parser.isoparse("2025-10-08T23:27:00+01:00")
+        run = RecentRun("pollok", date(2025, 9, 27), 612, 45, 1263, 62.43, True)
+        profiles = [
+            (
+                "12345",
+                {
+                    "name": "John Doe",
+                    "club_id": 1832,
+                    "club_name": "Bellahouston Harriers",
+                    "recent_runs": [run, run],
+                    "event_summaries": [EventSummary("pollok", 98, 15, 1263)],
+                },
+                refresh_after,
+            ),
+            (
+                "67890",
+                {"name": "Jane Smith", "club_id": None, "club_name": None, "recent_runs": [], "event_summaries": []},
+                refresh_after,
+            ),
+        ]
+        with DBClient() as db_client:
+            db_client.save_runner_profiles(profiles)
+
+        update, results, summaries = mock_cursor.execute.call_args_list
+        self.assertEqual(
+            call(
+                "UPDATE public.runners AS r SET name = v.name, club_id = v.club_id, club_name = v.club_name, "
+                "history_updated_at = %s, history_refresh_after = v.refresh_after, history_failures = 0 "
+                "FROM (VALUES (%s, %s, %s::integer, %s, %s::timestamptz), (%s, %s, %s::integer, %s, %s::timestamptz)) "
+                "AS v(id, name, club_id, club_name, refresh_after) WHERE r.id = v.id;",
+                [now, "12345", "John Doe", 1832, "Bellahouston Harriers", refresh_after]
+                + ["67890", "Jane Smith", None, None, refresh_after],
+            ),
+            update,
+        )
+        # The duplicate run is only written once
+        self.assertEqual(
+            call(
+                "INSERT INTO public.runner_results (runner_id, event, event_date, run_number, position, time_in_seconds, age_grade, pb) VALUES (%s, %s, %s, %s, %s, %s, %s, %s) "
+                "ON CONFLICT(runner_id, event, event_date) DO UPDATE SET run_number = EXCLUDED.run_number, position = EXCLUDED.position, "
+                "time_in_seconds = EXCLUDED.time_in_seconds, age_grade = EXCLUDED.age_grade, pb = EXCLUDED.pb;",
+                ["12345", "pollok", date(2025, 9, 27), 612, 45, 1263, 62.43, True],
+            ),
+            results,
+        )
+        self.assertEqual(
+            call(
+                "INSERT INTO public.runner_event_summaries (runner_id, event, runs, best_position, best_time_in_seconds) VALUES (%s, %s, %s, %s, %s) "
+                "ON CONFLICT(runner_id, event) DO UPDATE SET runs = EXCLUDED.runs, best_position = EXCLUDED.best_position, "
+                "best_time_in_seconds = EXCLUDED.best_time_in_seconds;",
+                ["12345", "pollok", 98, 15, 1263],
+            ),
+            summaries,
+        )
+
+    def test_defer_runner_refresh(self, mock_connect):
         mock_cursor = create_mock_cursor()
         mock_connect.return_value.cursor.return_value = mock_cursor
+        now = parser.isoparse("2025-10-01T23:27:00+01:00")
         with DBClient() as db_client:
-            db_client.update_runner_metadata("12345", "John Doe")
+            db_client.defer_runner_refresh(["12345", "67890"], now, timedelta(hours=1), timedelta(days=30))
         mock_cursor.execute.assert_called_with(
-            "UPDATE public.runners SET name = %s WHERE id = %s;", ("John Doe", "12345")
+            "UPDATE public.runners SET history_failures = history_failures + 1, "
+            "history_refresh_after = %s + LEAST(%s * power(2, LEAST(history_failures, %s)), %s) "
+            "WHERE id IN (%s, %s);",
+            # 1 hour doubled 10 times is past 30 days
+            [now, timedelta(hours=1), 10, timedelta(days=30), "12345", "67890"],
         )
 
 
@@ -0,0 +1,134 @@
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import Mock
+
+from app.utils.http_utils import create_session, read_html
+
+PAGE = b"<html><body><table></table><footer>" + b"x" * 20000 + b"</footer></body></html>"
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    connections = 0
+    body = PAGE
+
+    def setup(self):
+        KeepAliveHandler.connections += 1
+        super().setup()
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def streamed_response(chunks, encoding="utf-8", headers=None):
+    consumed = []
+
+    def iter_content(chunk_size):
+        for chunk in chunks:
+            consumed.append(chunk)
+            yield chunk
+
+    response = Mock()
+    response.encoding = encoding
+    response.headers = headers or {}
+    response.iter_content.side_effect = iter_content
+    return response, consumed
+
+
+class ReadHtmlTest(unittest.TestCase):
+    def test_reads_whole_body_without_stop_marker(self):
+        response, consumed = streamed_response([b"<html><body>", b"<h2>Name</h2>", b"</body></html>"])
+        html, bot_detected = read_html(response)
+
+        self.assertEqual("<html><body><h2>Name</h2></body></html>", html)
+        self.assertFalse(bot_detected)
+        self.assertEqual(3, len(consumed))
+        response.close.assert_called_once()
+
+    def test_stops_decoding_after_stop_marker_but_reads_the_rest(self):
+        response, consumed = streamed_response([b"<table></table>", b"<footer>", b"lots more", b"</html>"])
+        html, bot_detected = read_html(response, stop_marker="<footer")
+
+        self.assertEqual("<table></table><footer>", html)
+        self.assertFalse(bot_detected)
+        # The rest of the body is read so the connection can be reused
+        self.assertEqual(4, len(consumed))
+        response.close.assert_called_once()
+
+    def test_stops_reading_after_stop_marker_when_lots_is_left(self):
+        response, consumed = streamed_response(
+            [b"<table></table>", b"<footer>", b"lots more", b"</html>"], headers={"Content-Length": "1000000"}
+        )
+        response.raw.tell.return_value = 23
+        html, bot_detected = read_html(response, stop_marker="<footer")
+
+        self.assertEqual("<table></table><footer>", html)
+        self.assertEqual(2, len(consumed))
+
+    def test_detects_bot_signal_and_stops_reading(self):
+        response, consumed = streamed_response([b"<noscript><h1>JavaScript is disabled</h1>", b"rest of page"])
+        html, bot_detected = read_html(response, stop_marker="<footer")
+
+        self.assertTrue(bot_detected)
+        self.assertEqual(1, len(consumed))
+
+    def test_detects_bot_signal_split_across_chunks(self):
+        response, consumed = streamed_response([b"we detected unu", b"sual traffic from", b" your network"])
+        html, bot_detected = read_html(response)
+
+        self.assertTrue(bot_detected)
+        self.assertEqual(2, len(consumed))
+
+    def test_detects_stop_marker_split_across_chunks(self):
+        response, consumed = streamed_response([b"<table></table><foo", b"ter>", b"never read"])
+        html, bot_detected = read_html(response, stop_marker="<footer")
+
+        self.assertFalse(bot_detected)
+        self.assertEqual("<table></table><footer>", html)
+
+    def test_decodes_multibyte_characters_split_across_chunks(self):
+        body = "<td>Björk Guðmundsdóttir</td>".encode("utf-8")
+        split = body.index(b"\xc3") + 1
+        response, consumed = streamed_response([body[:split], body[split:]])
+        html, bot_detected = read_html(response)
+
+        self.assertEqual("<td>Björk Guðmundsdóttir</td>", html)
+
+    def test_defaults_to_utf8_when_encoding_unknown(self):
+        response, consumed = streamed_response(["<td>Zoë</td>".encode("utf-8")], encoding=None)
+        html, bot_detected = read_html(response)
+
+        self.assertEqual("<td>Zoë</td>", html)
+
+
+class ConnectionReuseTest(unittest.TestCase):
+    def setUp(self):
+        KeepAliveHandler.connections = 0
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_connection_is_reused_after_stop_marker(self):
+        session = create_session()
+        for _ in range(5):
+            html, bot_detected = read_html(session.get(self.url, stream=True), stop_marker="<footer")
+            self.assertIn("<footer>", html)
+            self.assertFalse(bot_detected)
+
+        self.assertEqual(1, KeepAliveHandler.connections)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,265 @@
+import os
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+from app.utils.identity_utils import ClientIdentity, IdentityPool, create_identity_pool, IDENTITY_PROFILES
+
+BOT_PAGE = b"<html><body><noscript><h1>JavaScript is disabled</h1></noscript></body></html>"
+RESULTS_PAGE = b"<html><body><table></table><footer></footer></body></html>"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def create_identity(name, requests_per_minute=60, burst=1):
+    return ClientIdentity(
+        name=name,
+        user_agent=f"{name}-agent",
+        client_hints={},
+        viewport={"width": 1280, "height": 720},
+        requests_per_minute=requests_per_minute,
+        burst=burst,
+    )
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    # Challenges any client whose User-Agent contains the blocked marker, like a WAF would
+    blocked_agent = "blocked"
+    requests = []
+
+    def do_GET(self):
+        user_agent = self.headers.get("User-Agent")
+        StandInHandler.requests.append(user_agent)
+        body = BOT_PAGE if self.blocked_agent in user_agent else RESULTS_PAGE
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class RateLimitedHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(429)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(handler):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@patch.dict(os.environ, {"ENV": "test"})
+class IdentityPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def create_pool(self, identities, rest_seconds=300, max_wait_seconds=60):
+        return IdentityPool(
+            identities,
+            rest_seconds=rest_seconds,
+            max_wait_seconds=max_wait_seconds,
+            clock=self.clock,
+            sleep=self.clock.sleep,
+        )
+
+    def test_requests_are_spread_across_identities(self):
+        identities = [create_identity("a", burst=3), create_identity("b", burst=3), create_identity("c", burst=3)]
+        pool = self.create_pool(identities)
+
+        names = [pool.acquire().name for _ in range(6)]
+
+        self.assertEqual(2, names.count("a"))
+        self.assertEqual(2, names.count("b"))
+        self.assertEqual(2, names.count("c"))
+
+    def test_acquire_waits_for_rate_budget(self):
+        pool = self.create_pool([create_identity("a", requests_per_minute=6, burst=1)])
+
+        pool.acquire()
+        pool.acquire()
+
+        # 6 requests a minute means waiting 10 seconds for the second token
+        self.assertAlmostEqual(10.0, self.clock.now)
+
+    def test_blocked_identity_is_rested_with_backoff(self):
+        identity = create_identity("a")
+        identity.record_block(0, rest_seconds=100)
+        self.assertEqual(100, identity.rested_until)
+        self.assertEqual(0.5, identity.health)
+
+        identity.record_block(100, rest_seconds=100)
+        self.assertEqual(300, identity.rested_until)
+
+        identity.record_success()
+        self.assertEqual(0, identity.consecutive_blocks)
+        self.assertAlmostEqual(0.35, identity.health)
+
+    def test_healthier_identities_are_preferred(self):
+        healthy = create_identity("healthy")
+        unhealthy = create_identity("unhealthy")
+        unhealthy.health = 0.5
+        pool = self.create_pool([unhealthy, healthy])
+
+        self.assertEqual("healthy", pool.acquire().name)
+
+    def test_rested_identity_is_skipped_until_rest_ends(self):
+        rested = create_identity("rested", burst=5)
+        rested.rested_until = 30
+        pool = self.create_pool([rested])
+
+        self.assertEqual("rested", pool.acquire().name)
+        self.assertEqual(30, self.clock.now)
+
+    def test_fetch_fails_rather_than_wait_too_long(self):
+        rested = create_identity("rested", burst=5)
+        rested.rested_until = 600
+        pool = self.create_pool([rested], max_wait_seconds=60)
+
+        self.assertEqual((None, False), pool.get_html_content("https://www.parkrun.org.uk/pollok/results/"))
+        self.assertEqual(0, self.clock.now)
+
+    def test_stop_interrupts_a_wait(self):
+        rested = create_identity("rested", burst=5)
+        rested.rested_until = time.monotonic() + 30
+        pool = IdentityPool([rested])
+        acquired = []
+        thread = threading.Thread(target=lambda: acquired.append(pool.acquire()))
+        thread.start()
+
+        pool.stop()
+        thread.join(timeout=5)
+
+        self.assertFalse(thread.is_alive())
+        self.assertEqual([None], acquired)
+
+    @patch("app.utils.identity_utils.get_html_content")
+    def test_identity_is_not_rested_when_the_browser_gets_the_page(self, mock_get_html_content):
+        def challenged_then_recovered(url, session, page, context, stop_marker, on_bot_detected):
+            on_bot_detected()
+            return RESULTS_PAGE.decode("utf-8"), True
+
+        mock_get_html_content.side_effect = challenged_then_recovered
+        identity = create_identity("a", burst=5)
+        pool = self.create_pool([identity])
+
+        for _ in range(3):
+            self.assertTrue(pool.get_html_content("https://www.parkrun.org.uk/pollok/results/")[1])
+
+        self.assertEqual(0, identity.rested_until)
+        self.assertEqual(0, identity.consecutive_blocks)
+        self.assertEqual(0, self.clock.now)
+
+    def test_rate_limited_identity_is_rested(self):
+        server = serve(RateLimitedHandler)
+        try:
+            identity = create_identity("a")
+            pool = self.create_pool([identity])
+
+            result = pool.get_html_content(f"http://127.0.0.1:{server.server_port}/results")
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        self.assertEqual((None, False), result)
+        self.assertEqual(300, identity.rested_until)
+        self.assertEqual(0.5, identity.health)
+
+    @patch("app.utils.identity_utils.new_stealth_context")
+    @patch("app.utils.identity_utils.launch_browser")
+    def test_threads_share_budgets_but_not_browsers(self, mock_launch_browser, mock_new_context):
+        mock_launch_browser.side_effect = lambda playwright_context_manager: f"browser-{playwright_context_manager}"
+        mock_new_context.side_effect = lambda browser, **kwargs: (f"page-{browser}", f"context-{browser}")
+        identity = create_identity("a", burst=2)
+        pool = self.create_pool([identity])
+        contexts = {}
+
+        def use_pool(name):
+            pool.use_playwright(name)
+            contexts[name] = pool.browser_context(pool.acquire())
+
+        threads = [threading.Thread(target=use_pool, args=(name,)) for name in ("one", "two")]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(("page-browser-one", "context-browser-one"), contexts["one"])
+        self.assertEqual(("page-browser-two", "context-browser-two"), contexts["two"])
+        # Both threads drew on the identity's single budget
+        self.assertAlmostEqual(0.0, identity.tokens, places=3)
+        # This thread never passed in a Playwright, so it has no browser
+        self.assertEqual((None, None), pool.browser_context(identity))
+
+    def test_against_stand_in_server(self):
+        StandInHandler.requests = []
+        server = serve(StandInHandler)
+        try:
+            url = f"http://127.0.0.1:{server.server_port}/results"
+            blocked = create_identity("blocked", burst=5)
+            allowed = create_identity("allowed", burst=5)
+            pool = self.create_pool([blocked, allowed])
+
+            results = [pool.get_html_content(url, stop_marker="<footer") for _ in range(4)]
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        # The first request is challenged, there is no browser to retry with, so it fails and the identity rests
+        self.assertEqual((BOT_PAGE.decode("utf-8"), False), results[0])
+        self.assertTrue(all(success for html, success in results[1:]))
+        self.assertEqual(["blocked-agent"] + ["allowed-agent"] * 3, StandInHandler.requests)
+        self.assertEqual(300, blocked.rested_until)
+        self.assertEqual(1.0, allowed.health)
+
+
+class CreateIdentityPoolTest(unittest.TestCase):
+    def test_one_identity_per_profile(self):
+        pool = create_identity_pool()
+
+        self.assertEqual([profile["name"] for profile in IDENTITY_PROFILES], [i.name for i in pool.identities])
+        self.assertTrue(all(identity.session.proxies == {} for identity in pool.identities))
+
+    def test_identities_have_coherent_headers(self):
+        pool = create_identity_pool()
+
+        for identity in pool.identities:
+            headers = identity.session.headers
+            if "Edg/" in headers["User-Agent"]:
+                self.assertIn("Microsoft Edge", headers["sec-ch-ua"])
+            if "Macintosh" in headers["User-Agent"]:
+                self.assertEqual('"macOS"', headers["sec-ch-ua-platform"])
+
+    @patch.dict(
+        os.environ, {"PROXY_URLS": "http://proxy1:8080, http://proxy2:8080,http://proxy3:8080,http://proxy4:8080"}
+    )
+    def test_proxies_are_assigned_to_identities(self):
+        pool = create_identity_pool()
+
+        self.assertEqual(4, len(pool.identities))
+        self.assertEqual("http://proxy2:8080", pool.identities[1].session.proxies["https"])
+        self.assertEqual("http://proxy4:8080", pool.identities[3].proxy)
+        self.assertEqual("chrome-windows-3", pool.identities[3].name)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import threading
+import time
+import unittest
+
+from app.utils.job_queue import Job, JobQueue
+
+
+def create_job(name, priority=10, jitter=0.0):
+    return Job(name, lambda db_client, identity_pool: True, lambda success, now: None, priority, jitter)
+
+
+class JobQueueTest(unittest.TestCase):
+    def test_due_jobs_are_returned_by_priority(self):
+        job_queue = JobQueue(clock=lambda: 100)
+        job_queue.schedule(create_job("metadata", priority=10), 50)
+        job_queue.schedule(create_job("club", priority=0), 90)
+
+        self.assertEqual("club", job_queue.get().name)
+        self.assertEqual("metadata", job_queue.get().name)
+
+    def test_jobs_are_not_returned_before_they_are_due(self):
+        job_queue = JobQueue()
+        job_queue.schedule(create_job("later", priority=0), time.time() + 60)
+        job_queue.schedule(create_job("soon", priority=10), time.time() + 0.05)
+
+        self.assertEqual("soon", job_queue.get().name)
+        self.assertEqual({"later"}, set(job_queue.next_run_times()))
+
+    def test_get_wakes_up_when_a_job_is_scheduled(self):
+        job_queue = JobQueue()
+        result = []
+        waiter = threading.Thread(target=lambda: result.append(job_queue.get()))
+        waiter.start()
+
+        job_queue.schedule(create_job("club"), time.time())
+        waiter.join(timeout=5)
+
+        self.assertEqual("club", result[0].name)
+
+    def test_close_releases_waiting_workers(self):
+        job_queue = JobQueue()
+        job_queue.schedule(create_job("later"), time.time() + 60)
+        result = []
+        waiter = threading.Thread(target=lambda: result.append(job_queue.get()))
+        waiter.start()
+
+        job_queue.close()
+        waiter.join(timeout=5)
+
+        self.assertEqual([None], result)
+
+    def test_jitter_delays_run_time(self):
+        job_queue = JobQueue()
+        job = create_job("club", jitter=30)
+        job_queue.schedule(job, 1000)
+
+        self.assertGreaterEqual(job.run_at, 1000)
+        self.assertLessEqual(job.run_at, 1030)
+        self.assertEqual(1, len(job_queue))
+
+
+if __name__ == "__main__":
+    unittest.main()
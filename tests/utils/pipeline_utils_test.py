@@ -0,0 +1,92 @@
+import threading
+import unittest
+
+from app.utils.pipeline_utils import PipelineStage
+
+
+class PipelineStageTest(unittest.TestCase):
+    def test_items_flow_through_stages_in_order(self):
+        results = []
+        writer = PipelineStage("write", results.append)
+        parser = PipelineStage("parse", lambda item: item * 2, downstream=writer).start()
+        for i in range(10):
+            parser.put(i)
+        parser.close()
+        parser.join()
+
+        self.assertEqual([i * 2 for i in range(10)], results)
+
+    def test_none_results_are_not_forwarded(self):
+        results = []
+        writer = PipelineStage("write", results.append)
+        parser = PipelineStage("parse", lambda item: item if item % 2 else None, downstream=writer).start()
+        for i in range(6):
+            parser.put(i)
+        parser.close()
+        parser.join()
+
+        self.assertEqual([1, 3, 5], results)
+
+    def test_on_close_runs_after_last_item(self):
+        events = []
+        stage = PipelineStage("write", events.append, on_close=lambda: events.append("closed")).start()
+        stage.put("a")
+        stage.put("b")
+        stage.close()
+        stage.join()
+
+        self.assertEqual(["a", "b", "closed"], events)
+
+    def test_put_blocks_when_inbox_is_full(self):
+        release = threading.Event()
+        stage = PipelineStage("slow", lambda item: release.wait(), maxsize=1).start()
+        stage.put(1)
+        stage.put(2)
+
+        blocked = threading.Thread(target=stage.put, args=(3,))
+        blocked.start()
+        blocked.join(timeout=0.3)
+        self.assertTrue(blocked.is_alive())
+
+        release.set()
+        blocked.join()
+        stage.close()
+        stage.join()
+
+    def test_failure_in_downstream_stage_is_raised_upstream(self):
+        def fail(item):
+            raise ValueError("Write failed")
+
+        writer = PipelineStage("write", fail, maxsize=1)
+        parser = PipelineStage("parse", lambda item: item, downstream=writer, maxsize=1).start()
+
+        with self.assertRaises(RuntimeError) as error:
+            for i in range(100):
+                parser.put(i)
+        self.assertIsInstance(error.exception.__cause__, ValueError)
+
+        parser.close()
+        with self.assertRaises(RuntimeError):
+            parser.join()
+
+    def test_downstream_is_flushed_when_upstream_fails(self):
+        written = []
+
+        def parse(item):
+            if item == 2:
+                raise ValueError("Bad page")
+            return item
+
+        writer = PipelineStage("write", lambda item: None, on_close=lambda: written.append("flushed"))
+        parser = PipelineStage("parse", parse, downstream=writer).start()
+        parser.put(1)
+        parser.put(2)
+        parser.close()
+        with self.assertRaises(RuntimeError):
+            parser.join()
+
+        self.assertEqual(["flushed"], written)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+import unittest
+from unittest.mock import patch
+
+from app.utils.pipeline_utils import PipelineStage
+from app.utils.profiling_utils import Profiler, current_profiler, profile_handler, profiling_enabled, CATEGORIES
+
+
+@profile_handler
+def handler(event, context):
+    time.sleep(0.01)
+    return {"statusCode": 200}
+
+
+class ProfilingEnabledTest(unittest.TestCase):
+    @patch.dict(os.environ, {"PROFILE": ""})
+    def test_disabled_by_default(self):
+        self.assertFalse(profiling_enabled({}))
+        self.assertFalse(profiling_enabled(None))
+
+    @patch.dict(os.environ, {"PROFILE": ""})
+    def test_enabled_by_event(self):
+        self.assertTrue(profiling_enabled({"profile": True}))
+
+    @patch.dict(os.environ, {"PROFILE": "true"})
+    def test_enabled_by_environment(self):
+        self.assertTrue(profiling_enabled({}))
+
+
+class ProfilerTest(unittest.TestCase):
+    def test_writes_reports_and_summary(self):
+        with tempfile.TemporaryDirectory() as output:
+            with Profiler("test", output=output) as profiler:
+                self.assertIs(profiler, current_profiler())
+                time.sleep(0.01)
+                data = [str(i) for i in range(1000)]
+
+            files = sorted(os.listdir(output))
+            self.assertEqual(3, len(files))
+            self.assertTrue(files[0].endswith("-allocations.txt"))
+            self.assertTrue(files[1].endswith("-profile.txt"))
+            self.assertTrue(files[2].endswith(".prof"))
+
+        self.assertIsNone(current_profiler())
+        self.assertEqual(1000, len(data))
+        summary = profiler.summary
+        self.assertGreaterEqual(summary["duration_seconds"], 0.01)
+        self.assertEqual(set(CATEGORIES), set(summary["categories"]))
+        self.assertGreater(summary["categories"]["sleep"], 0)
+        self.assertTrue(summary["hotspots"])
+        self.assertTrue(summary["report"].endswith(".prof"))
+
+    @patch("app.utils.db_utils.DBClient")
+    def test_saves_reports_to_db(self, mock_db_client):
+        db_client = mock_db_client.return_value.__enter__.return_value
+
+        with Profiler("test", output="db") as profiler:
+            pass
+
+        self.assertEqual("db", profiler.summary["report"])
+        name, summary, profile_report, allocation_report = db_client.save_profile_report.call_args.args
+        self.assertEqual("test", name)
+        self.assertIn("function calls", profile_report)
+
+    def test_overlapping_profilers_run_one_at_a_time(self):
+        started = threading.Event()
+        finish = threading.Event()
+        profilers = {}
+
+        def profile_in_thread():
+            with tempfile.TemporaryDirectory() as output, Profiler("first", output=output) as profiler:
+                profilers["first"] = profiler
+                started.set()
+                finish.wait(5)
+                time.sleep(0.01)
+
+        thread = threading.Thread(target=profile_in_thread)
+        thread.start()
+        started.wait(5)
+        try:
+            with Profiler("second", output="unused") as second:
+                # The busy profiler is skipped rather than failing, and nothing runs inline on this thread
+                self.assertIsNone(current_profiler())
+        finally:
+            finish.set()
+            thread.join()
+
+        self.assertIsNone(second.summary)
+        self.assertGreater(profilers["first"].summary["duration_seconds"], 0)
+        self.assertFalse(tracemalloc.is_tracing())
+
+        # The lock is free again once the first profile has finished
+        with tempfile.TemporaryDirectory() as output, Profiler("third", output=output) as third:
+            self.assertIs(third, current_profiler())
+        self.assertIsNotNone(third.summary)
+
+    def test_tracemalloc_started_elsewhere_keeps_running(self):
+        tracemalloc.start()
+        try:
+            with tempfile.TemporaryDirectory() as output, Profiler("test", output=output):
+                pass
+            self.assertTrue(tracemalloc.is_tracing())
+        finally:
+            tracemalloc.stop()
+
+    def test_profiler_that_fails_to_start_is_not_current(self):
+        with patch("cProfile.Profile.enable", side_effect=ValueError("Another profiling tool is already active")):
+            with Profiler("test", output="unused") as profiler:
+                self.assertIsNone(current_profiler())
+
+        self.assertIsNone(profiler.summary)
+        self.assertFalse(tracemalloc.is_tracing())
+        with tempfile.TemporaryDirectory() as output, Profiler("retry", output=output) as retry:
+            self.assertIs(retry, current_profiler())
+
+    def test_pipeline_stages_run_inline_while_profiling(self):
+        threads = []
+        with tempfile.TemporaryDirectory() as output, Profiler("test", output=output):
+            stage = PipelineStage("record", lambda item: threads.append(threading.current_thread().name)).start()
+            stage.put(1)
+            stage.close()
+            stage.join()
+
+        self.assertEqual(["MainThread"], threads)
+
+
+class ProfileHandlerTest(unittest.TestCase):
+    @patch.dict(os.environ, {"PROFILE": ""})
+    def test_no_profile_unless_requested(self):
+        self.assertEqual({"statusCode": 200}, handler({}, None))
+
+    @patch.dict(os.environ, {"PROFILE": ""})
+    def test_profile_added_to_response(self):
+        with tempfile.TemporaryDirectory() as output, patch.dict(os.environ, {"PROFILE_OUTPUT": output}):
+            response = handler({"profile": True}, None)
+
+        self.assertEqual(200, response["statusCode"])
+        self.assertIn("hotspots", response["profile"])
+        self.assertTrue(os.path.basename(response["profile"]["report"]).startswith("profiling_utils_test-"))
+
+
+if __name__ == "__main__":
+    unittest.main()
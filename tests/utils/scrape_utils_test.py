@@ -0,0 +1,57 @@
+import datetime
+import unittest
+from unittest.mock import Mock, patch
+
+from freezegun import freeze_time
+
+from app.utils.scrape_utils import recent_scrape_window, run_scrape, scrape_resources
+
+
+@patch("app.utils.scrape_utils.DBClient")
+@patch("app.utils.scrape_utils.sync_playwright")
+@patch("app.utils.scrape_utils.create_identity_pool")
+class ScrapeResourcesTest(unittest.TestCase):
+    def test_opens_and_closes_what_is_not_passed_in(self, mock_identity_pool, mock_sync_pw, mock_db_client):
+        with scrape_resources() as (db_client, identity_pool):
+            self.assertEqual(mock_db_client.return_value.__enter__.return_value, db_client)
+            self.assertEqual(mock_identity_pool.return_value, identity_pool)
+            mock_identity_pool.assert_called_with(mock_sync_pw.return_value.__enter__.return_value)
+
+        mock_identity_pool.return_value.close.assert_called_once()
+        mock_sync_pw.return_value.__exit__.assert_called_once()
+        mock_db_client.return_value.__exit__.assert_called_once()
+
+    def test_leaves_what_is_passed_in_open(self, mock_identity_pool, mock_sync_pw, mock_db_client):
+        passed_db_client = Mock()
+        passed_identity_pool = Mock()
+
+        with scrape_resources(passed_db_client, passed_identity_pool) as (db_client, identity_pool):
+            self.assertEqual(passed_db_client, db_client)
+            self.assertEqual(passed_identity_pool, identity_pool)
+
+        mock_db_client.assert_not_called()
+        mock_sync_pw.assert_not_called()
+        passed_db_client.close.assert_not_called()
+        passed_identity_pool.close.assert_not_called()
+
+    def test_run_scrape_passes_the_resources_to_the_scrape(self, mock_identity_pool, mock_sync_pw, mock_db_client):
+        scrape = Mock(return_value=True)
+
+        self.assertTrue(run_scrape(scrape))
+
+        scrape.assert_called_once_with(
+            mock_db_client.return_value.__enter__.return_value, mock_identity_pool.return_value
+        )
+
+
+class RecentScrapeWindowTest(unittest.TestCase):
+    @freeze_time("2025-10-20")
+    def test_goes_back_before_the_last_scrape(self):
+        db_client = Mock()
+        db_client.get_last_club_athlete_scrape_time.return_value = datetime.datetime(2025, 10, 15, 9, 30)
+
+        self.assertEqual((datetime.date(2025, 9, 30), datetime.date(2025, 10, 20)), recent_scrape_window(db_client))
+
+
+if __name__ == "__main__":
+    unittest.main()